@@ -0,0 +1,201 @@
+import { afterEach, beforeEach, describe, expect, it, vi } from 'vitest'
+import { fetchCatalog, prepareCatalog, projectCatalog } from './catalog'
+
+describe('projectCatalog()', () => {
+  const master = {
+    levels: ['easy', 'expert', 'guru'],
+    title: {
+      'x-levels': {
+        easy: 'Haddock 3 on easy level',
+        expert: 'Haddock 3 on expert level',
+        guru: 'Haddock 3 on guru level'
+      }
+    },
+    categories: [
+      { name: 'topology' },
+      { explevel: 'guru', name: 'extras' }
+    ],
+    global: {
+      schema: {
+        type: 'object',
+        properties: {
+          ncores: { type: 'number' },
+          debug: { explevel: 'guru', type: 'boolean' }
+        },
+        additionalProperties: { 'x-levels': { easy: false, expert: false } }
+      }
+    },
+    nodes: []
+  }
+
+  it('should give catalog of easy level', () => {
+    const expected = {
+      title: 'Haddock 3 on easy level',
+      categories: [{ name: 'topology' }],
+      global: {
+        schema: {
+          type: 'object',
+          properties: {
+            ncores: { type: 'number' }
+          },
+          additionalProperties: false
+        }
+      },
+      nodes: []
+    }
+    expect(projectCatalog(master, 'easy')).toEqual(expected)
+  })
+
+  it('should give catalog of guru level', () => {
+    const expected = {
+      title: 'Haddock 3 on guru level',
+      categories: [{ name: 'topology' }, { name: 'extras' }],
+      global: {
+        schema: {
+          type: 'object',
+          properties: {
+            ncores: { type: 'number' },
+            debug: { type: 'boolean' }
+          }
+        }
+      },
+      nodes: []
+    }
+    expect(projectCatalog(master, 'guru')).toEqual(expected)
+  })
+
+  it('should throw error for unknown level', () => {
+    expect(() => projectCatalog(master, 'expert2')).toThrow('Level expert2 not found in catalog')
+  })
+})
+
+describe('fetchCatalog()', () => {
+  const node = {
+    description: 'Some description',
+    schema: {
+      type: 'object',
+      properties: {
+        param1: { type: 'number', default: 1 }
+      }
+    },
+    uiSchema: {},
+    tomlSchema: {},
+    defaults: { param1: 1 }
+  }
+  function skeleton (title: string, schemaUrl: string): unknown {
+    return {
+      title,
+      categories: [{ name: 'topology', description: 'Topology' }],
+      global: { schema: { type: 'object', properties: {} }, uiSchema: {} },
+      nodes: [{ id: 'topoaa', label: 'Topology', category: 'topology', schemaUrl }],
+      examples: {}
+    }
+  }
+  const documents: Record<string, unknown> = {
+    'http://localhost/catalog/haddock3.easy.json': skeleton('Haddock 3 on easy level', '/catalog/nodes/topoaa.0123456789abcdef.json'),
+    'http://localhost/catalog/nodes/topoaa.0123456789abcdef.json': node,
+    'http://localhost/catalog/haddock3.expert.json': skeleton('Haddock 3 on expert level', 'nodes/topoaa.fedcba9876543210.json'),
+    'http://localhost/catalog/haddock3.guru.json': skeleton('Haddock 3 on guru level', 'nodes/topoaa.fedcba9876543210.json'),
+    'http://localhost/catalog/nodes/topoaa.fedcba9876543210.json': node
+  }
+  const fetchMock = vi.fn(async (url: string) => {
+    const body = documents[url]
+    return {
+      ok: body !== undefined,
+      json: async () => body
+    }
+  })
+
+  beforeEach(() => {
+    vi.stubGlobal('fetch', fetchMock)
+  })
+
+  afterEach(() => {
+    vi.unstubAllGlobals()
+    fetchMock.mockClear()
+  })
+
+  it('should fetch schemas of nodes of sharded catalog', async () => {
+    const catalog = await fetchCatalog('http://localhost/catalog/haddock3.easy.json')
+
+    expect(catalog.nodes[0]).toMatchObject({
+      id: 'topoaa',
+      label: 'Topology',
+      category: 'topology',
+      ...node
+    })
+    expect(catalog.nodes[0]).not.toHaveProperty('schemaUrl')
+  })
+
+  it('should fetch node which is same on multiple levels once', async () => {
+    await fetchCatalog('http://localhost/catalog/haddock3.expert.json')
+    await fetchCatalog('http://localhost/catalog/haddock3.guru.json')
+
+    const nodeUrls = fetchMock.mock.calls.map(([url]) => url).filter((url) => url.includes('/nodes/'))
+    expect(nodeUrls).toEqual(['http://localhost/catalog/nodes/topoaa.fedcba9876543210.json'])
+  })
+})
+
+describe('prepareCatalog()', () => {
+  it('should inline $refs of deduplicated catalog', () => {
+    // Like --dedup of generate_haddock3_catalog.py writes it
+    const residue = {
+      type: 'number',
+      format: 'residue',
+      title: 'Residue number',
+      minimum: -9999,
+      maximum: 9999
+    }
+    const deduped = {
+      title: 'Haddock 3 on easy level',
+      categories: [{ name: 'refinement', description: 'Refinement' }],
+      global: { schema: { type: 'object', properties: {} }, uiSchema: {} },
+      nodes: [
+        {
+          id: 'emref',
+          label: 'Energy minimisation',
+          category: 'refinement',
+          description: 'Some description',
+          schema: {
+            type: 'object',
+            properties: {
+              hisd: { type: 'array', items: { $ref: '#/$defs/0123456789ab' } },
+              hise: { type: 'array', items: { $ref: '#/$defs/0123456789ab' } }
+            }
+          },
+          uiSchema: {}
+        }
+      ],
+      examples: {},
+      $defs: {
+        '0123456789ab': residue
+      }
+    }
+
+    const catalog = prepareCatalog(deduped)
+
+    expect(catalog).not.toHaveProperty('$defs')
+    expect(catalog.nodes[0].schema).toEqual({
+      type: 'object',
+      properties: {
+        hisd: { type: 'array', items: residue },
+        hise: { type: 'array', items: residue }
+      }
+    })
+    const properties = catalog.nodes[0].schema.properties as Record<string, { items: unknown }>
+    expect(properties.hisd.items).not.toBe(properties.hise.items)
+  })
+
+  it('should throw error for $ref without $defs entry', () => {
+    const deduped = {
+      title: 'Haddock 3 on easy level',
+      categories: [],
+      global: { schema: { type: 'object', properties: { a: { $ref: '#/$defs/missing' } } }, uiSchema: {} },
+      nodes: [],
+      examples: {},
+      $defs: {}
+    }
+
+    expect(() => prepareCatalog(deduped)).toThrow('Catalog has no $defs for #/$defs/missing')
+  })
+})
@@ -1,7 +1,9 @@
+import { JSONSchema7 } from 'json-schema'
 import { load } from 'js-yaml'
 import { groupCatalog } from './grouper'
 import { ICatalog, ICatalogIndex, IGlobal } from './types'
 import { validateCatalog, ValidationError } from './validate'
+import { isObject } from './utils/isObject'
 
 /**
  * URL where catalog index can be found. Defaults to `/catalog/index.json` relative to the `import.meta.url`.
@@ -11,18 +13,96 @@ export const defaultCatalogIndexURL = new URL(
   import.meta.url
 ).href
 
-export async function fetchCatalog (catalogUrl: string): Promise<ICatalog> {
-  const response = await fetch(catalogUrl)
+async function fetchDocument (url: URL, error: string): Promise<unknown> {
+  const response = await fetch(url.href)
   if (!response.ok) {
-    throw new Error('Error retrieving catalog')
+    throw new Error(error)
   }
-  const yamlText = await response.text()
-  const body = load(yamlText)
+  // JSON.parse is much faster than the YAML parser, so use it for JSON documents
+  return url.pathname.endsWith('.json')
+    ? await response.json()
+    : load(await response.text())
+}
+
+export async function fetchCatalog (catalogUrl: string): Promise<ICatalog> {
+  const url = new URL(catalogUrl, import.meta.url)
+  let body = await fetchDocument(url, 'Error retrieving catalog')
+  // A master catalog contains all levels, the level to show is in the fragment of the URL
+  const level = url.hash.slice(1)
+  if (level !== '' && isMasterCatalog(body)) {
+    body = projectCatalog(body, level)
+  }
+  body = await fetchShardedNodes(body, url.href)
 
   // TODO move prepare to store.useSetCatalog
   return prepareCatalog(body)
 }
 
+/**
+ * Node details by URL, shared by all catalogs so a node which is the same on multiple levels is fetched once.
+ */
+const nodeDetails = new Map<string, Promise<unknown>>()
+
+/**
+ * Fetch the details of a node of a sharded catalog.
+ *
+ * The file name of the details contains a hash of its content, so the details of a URL never change
+ * and are only fetched the first time they are asked for.
+ *
+ * @param nodeUrl URL of file with description, schema, uiSchema and tomlSchema of a node
+ * @returns The node details
+ */
+export async function fetchNodeDetails (nodeUrl: string): Promise<unknown> {
+  let details = nodeDetails.get(nodeUrl)
+  if (details === undefined) {
+    details = fetchDocument(new URL(nodeUrl), `Error retrieving node details from ${nodeUrl}`)
+      .catch((error) => {
+        // Allow a retry when fetching failed
+        nodeDetails.delete(nodeUrl)
+        throw error
+      })
+    nodeDetails.set(nodeUrl, details)
+  }
+  return await details
+}
+
+function isShardedNode (node: unknown): node is { schemaUrl: string } {
+  return isObject(node) && typeof (node as { schemaUrl?: unknown }).schemaUrl === 'string'
+}
+
+/**
+ * Replace each node of a sharded catalog which only has id, label, category and schemaUrl
+ * with the node including the details fetched from schemaUrl.
+ *
+ * The details are fetched concurrently and only for the nodes in the catalog,
+ * nodes of a catalog that is not sharded are returned as is.
+ *
+ * @param catalog Catalog with nodes
+ * @param catalogUrl URL of catalog, a relative schemaUrl is resolved against it
+ * @returns Catalog with nodes which have their schemas
+ */
+export async function fetchShardedNodes (catalog: unknown, catalogUrl: string): Promise<unknown> {
+  if (!isObject(catalog) || !Array.isArray((catalog as { nodes?: unknown }).nodes)) {
+    return catalog
+  }
+  const nodes: unknown[] = (catalog as { nodes: unknown[] }).nodes
+  if (!nodes.some(isShardedNode)) {
+    return catalog
+  }
+  const resolved = await Promise.all(nodes.map(async (node) => {
+    if (!isShardedNode(node)) {
+      return node
+    }
+    const { schemaUrl, ...skeleton } = node
+    const details = await fetchNodeDetails(new URL(schemaUrl, catalogUrl).href)
+    if (!isObject(details)) {
+      throw new Error(`Retrieved node details from ${schemaUrl} are malformed`)
+    }
+    return { ...skeleton, ...details }
+  }))
+  return { ...catalog, nodes: resolved }
+}
+
 /**
  *
  * @param unGroupedCatalog
@@ -32,7 +112,7 @@ export function prepareCatalog (unGroupedCatalog: unknown): ICatalog {
   if (!isCatalog(unGroupedCatalog)) {
     throw new Error('Retrieved catalog is malformed')
   }
-  const catalog = groupCatalog(unGroupedCatalog)
+  const catalog = groupCatalog(inlineRefs(unGroupedCatalog))
   const errors = validateCatalog(catalog)
   if (errors.length > 0) {
     throw new ValidationError('Invalid catalog loaded', errors)
@@ -40,6 +120,110 @@ export function prepareCatalog (unGroupedCatalog: unknown): ICatalog {
   return catalog
 }
 
+const defsPrefix = '#/$defs/'
+
+/**
+ * Catalog with each `{$ref: '#/$defs/<name>'}` in the global and node schemas replaced by the sub schema
+ * in `$defs` of the catalog and without `$defs`.
+ *
+ * A deduplicated catalog (see --dedup of the haddock3 catalog generator) stores sub schemas that occur
+ * multiple times once in `$defs` of the catalog. The refs point outside the schema they are in,
+ * so they can not be resolved by Ajv or rjsf and are inlined before the catalog is used.
+ *
+ * @param catalog Catalog with or without `$defs`
+ * @returns Catalog without `$defs`
+ */
+export function inlineRefs (catalog: ICatalog): ICatalog {
+  const { $defs, ...rest } = catalog as ICatalog & { $defs?: Record<string, unknown> }
+  if ($defs === undefined) {
+    return catalog
+  }
+  function inline (value: unknown): unknown {
+    if (Array.isArray(value)) {
+      return value.map(inline)
+    }
+    if (!isObject(value)) {
+      return value
+    }
+    const ref = (value as { $ref?: unknown }).$ref
+    if (Object.keys(value).length === 1 && typeof ref === 'string' && ref.startsWith(defsPrefix)) {
+      const name = ref.slice(defsPrefix.length)
+      if ($defs === undefined || !(name in $defs)) {
+        throw new Error(`Catalog has no $defs for ${ref}`)
+      }
+      // Each ref gets its own copy, so changing one place does not change the others
+      return inline($defs[name])
+    }
+    return Object.fromEntries(Object.entries(value).map(([k, v]) => [k, inline(v)]))
+  }
+  return {
+    ...rest,
+    global: { ...rest.global, schema: inline(rest.global.schema) as JSONSchema7 },
+    nodes: rest.nodes.map((node) => ({ ...node, schema: inline(node.schema) as JSONSchema7 }))
+  }
+}
+
+export interface IMasterCatalog {
+  levels: string[]
+  [key: string]: unknown
+}
+
+function isMasterCatalog (catalog: unknown): catalog is IMasterCatalog {
+  return (
+    isObject(catalog) &&
+    'levels' in catalog &&
+    Array.isArray((catalog as IMasterCatalog).levels)
+  )
+}
+
+function isPerLevel (value: unknown): value is { 'x-levels': Record<string, unknown> } {
+  return isObject(value) && Object.keys(value).length === 1 && 'x-levels' in value
+}
+
+/**
+ * Catalog of a level from a master catalog.
+ *
+ * In a master catalog a value present from a certain level has an `explevel` key with that level and
+ * a value which differs per level is stored as `{'x-levels': {<level>: <value>}}`.
+ *
+ * @param master Catalog with all levels
+ * @param level Level to project master catalog on
+ * @returns Catalog of level
+ */
+export function projectCatalog (master: IMasterCatalog, level: string): unknown {
+  const { levels, ...catalog } = master
+  const rank = levels.indexOf(level)
+  if (rank === -1) {
+    throw new Error(`Level ${level} not found in catalog, available are ${levels.join(', ')}`)
+  }
+  function isVisible (value: unknown): boolean {
+    if (isPerLevel(value)) {
+      return level in value['x-levels']
+    }
+    if (isObject(value) && 'explevel' in value) {
+      return rank >= levels.indexOf((value as { explevel: string }).explevel)
+    }
+    return true
+  }
+  function project (value: unknown): unknown {
+    if (isPerLevel(value)) {
+      return value['x-levels'][level]
+    }
+    if (Array.isArray(value)) {
+      return value.filter(isVisible).map(project)
+    }
+    if (isObject(value)) {
+      return Object.fromEntries(
+        Object.entries(value)
+          .filter(([k, v]) => k !== 'explevel' && isVisible(v))
+          .map(([k, v]) => [k, project(v)])
+      )
+    }
+    return value
+  }
+  return project(catalog)
+}
+
 export function isCatalog (catalog: unknown): catalog is ICatalog {
   return (
     typeof catalog === 'object' &&
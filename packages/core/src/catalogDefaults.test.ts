@@ -0,0 +1,104 @@
+import { utils } from '@rjsf/core'
+import { JSONSchema7 } from 'json-schema'
+import { describe, expect, it } from 'vitest'
+import { IParameters } from './types'
+
+/**
+ * Form data rjsf ends up with when it renders an empty form,
+ * each render calls getDefaultFormState with the form data of the previous render.
+ */
+function renderedFormData (schema: JSONSchema7, maxRenders = 10): IParameters {
+  let formData: IParameters | undefined
+  for (let i = 0; i < maxRenders; i++) {
+    const rendered = utils.getDefaultFormState(schema, formData, schema) as IParameters
+    if (JSON.stringify(rendered) === JSON.stringify(formData)) {
+      return rendered
+    }
+    formData = rendered
+  }
+  throw new Error(`Form data did not settle after ${maxRenders} renders`)
+}
+
+describe('defaults of haddock3 catalog node', () => {
+  // Node as written by packages/haddock3_catalog/generate_haddock3_catalog.py,
+  // with descriptions left out
+  const node = {
+    id: 'emref',
+    schema: {
+      type: 'object',
+      properties: {
+        elecflag: {
+          default: true,
+          title: 'Electrostatics',
+          type: 'boolean'
+        },
+        dielec: {
+          default: 'cdie',
+          title: 'Dielectric',
+          type: 'string',
+          enum: ['cdie', 'rdie']
+        },
+        ncs: {
+          type: 'array',
+          title: 'Non-crystallographic symmetry restraints',
+          items: {
+            type: 'object',
+            properties: {
+              sta1: {
+                default: 1,
+                title: 'Start residue number',
+                type: 'number',
+                format: 'residue'
+              },
+              seg1: {
+                default: 'A',
+                title: 'Segment ID',
+                type: 'string',
+                format: 'chain'
+              }
+            },
+            required: [],
+            additionalProperties: false
+          }
+        },
+        mol_fix_origin: {
+          type: 'array',
+          maxItemsFrom: 'molecules',
+          title: 'Fix origin(s)',
+          items: {
+            default: false,
+            title: 'Fix origin',
+            type: 'boolean'
+          }
+        }
+      },
+      required: [],
+      if: {
+        properties: {
+          dielec: {
+            const: 'rdie'
+          }
+        }
+      },
+      then: {},
+      else: {
+        properties: {
+          solvshell: {
+            default: false,
+            title: 'Solvent shell',
+            type: 'boolean'
+          }
+        }
+      }
+    } as unknown as JSONSchema7,
+    defaults: {
+      elecflag: true,
+      dielec: 'cdie',
+      solvshell: false
+    }
+  }
+
+  it('should be the form data rjsf fills an empty form with', () => {
+    expect(renderedFormData(node.schema)).toEqual(node.defaults)
+  })
+})
@@ -176,3 +176,91 @@ describe('useSelectedCatalogNode()', () => {
     })
   })
 })
+
+describe('useWorkflow()', () => {
+  describe('addNodeToWorkflow()', () => {
+    it('should copy defaults of catalog node into parameters of new node', async () => {
+      vi.useFakeTimers()
+
+      const { result } = renderHook(
+        () => {
+          const setCatalog = useSetCatalog()
+          const workflow = useWorkflow()
+          return {
+            setCatalog,
+            workflow
+          }
+        },
+        {
+          wrapper: RecoilRoot
+        }
+      )
+
+      const defaults = {
+        parameterX: 'x',
+        parameterY: ['y']
+      }
+      act(() => {
+        const catalog = {
+          title: 'Some title',
+          categories: [
+            {
+              name: 'cat1',
+              description: 'First category'
+            }
+          ],
+          global: {
+            schema: {
+              type: 'object',
+              properties: {}
+            },
+            uiSchema: {}
+          },
+          nodes: [
+            {
+              category: 'cat1',
+              description: 'Description of somenode',
+              id: 'somenode',
+              label: 'Some node',
+              schema: {
+                type: 'object',
+                properties: {
+                  parameterX: {
+                    type: 'string',
+                    default: 'x'
+                  },
+                  parameterY: {
+                    type: 'array',
+                    items: {
+                      type: 'string'
+                    },
+                    default: ['y']
+                  }
+                }
+              },
+              uiSchema: {},
+              defaults
+            }
+          ],
+          examples: {}
+        }
+        result.current.setCatalog(prepareCatalog(catalog))
+      })
+      // Add nodes after render, so addNodeToWorkflow sees the catalog
+      act(() => {
+        result.current.workflow.addNodeToWorkflow('somenode')
+      })
+      act(() => {
+        result.current.workflow.addNodeToWorkflow('somenode')
+      })
+
+      await flushPromisesAndTimers()
+
+      const nodes = result.current.workflow.nodes
+      expect(nodes.map((n) => n.parameters)).toEqual([defaults, defaults])
+      // Each node has its own copy
+      expect(nodes[0].parameters.parameterY).not.toBe(nodes[1].parameters.parameterY)
+      expect(nodes[0].parameters.parameterY).not.toBe(defaults.parameterY)
+    })
+  })
+})
@@ -438,16 +438,23 @@ function enrichSchemaWithMolInfo (catalogNode: ICatalogNode | undefined, globalP
   return schemaWithMolInfo
 }
 
+/**
+ * Parameters of a node that is added to the workflow.
+ * Starts from the defaults precomputed by the catalog generator,
+ * so rjsf does not have to derive them from the schema when the node is selected.
+ */
 function emptyNodeParams (catalog: ICatalog, globalParameters: IParameters, info: [MoleculeInfo[], string | undefined], nodeType: string): IParameters {
   const catalogNode = catalog.nodes.find((n) => n.id === nodeType)
   if (catalogNode === undefined) {
     return {}
   }
   const schemaWithMolInfo = enrichSchemaWithMolInfo(catalogNode, globalParameters, info)
-  if (schemaWithMolInfo === undefined) {
-    return emptyGlobalParams(catalogNode.schema)
+  const parameters = emptyGlobalParams(schemaWithMolInfo ?? catalogNode.schema)
+  if (catalogNode.defaults === undefined) {
+    return parameters
   }
-  return emptyGlobalParams(schemaWithMolInfo)
+  // Each node gets its own copy, so editing one node does not change the catalog or other nodes
+  return { ...parameters, ...structuredClone(catalogNode.defaults) }
 }
 
 /**
@@ -588,10 +595,11 @@ export function useWorkflow (): UseWorkflow {
     },
     addNodeToWorkflowAt (nodeType: string, targetId: string) {
       const targetIndex = nodes.findIndex((n) => n.id === targetId)
+      const parameters = emptyNodeParams(catalog, global, moleculeInfos, nodeType)
       setNodes((oldNodes) => {
         const newNodes = [
           ...oldNodes,
-          { type: nodeType, parameters: {}, id: nanoid() }
+          { type: nodeType, parameters, id: nanoid() }
         ]
         return moveItem(newNodes, newNodes.length - 1, targetIndex)
       })
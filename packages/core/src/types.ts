@@ -33,6 +33,10 @@ export interface ICatalogNode {
   formSchema?: JSONSchema7
   formUiSchema?: UiSchema
   tomlSchema?: TomlObjectSchema
+  /**
+   * Form data rjsf derives from schema for an empty form, precomputed by catalog generator.
+   */
+  defaults?: IParameters
   description: string
   category: string
 }
@@ -49,6 +53,10 @@ export interface IGlobal {
   formSchema?: JSONSchema7
   formUiSchema?: UiSchema
   tomlSchema?: TomlObjectSchema
+  /**
+   * Form data rjsf derives from schema for an empty form, precomputed by catalog generator.
+   */
+  defaults?: IParameters
 }
 
 export interface ICatalog {
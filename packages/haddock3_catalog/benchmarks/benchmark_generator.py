@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""Benchmark stages of the haddock3 catalog generator on synthetic haddock3 packages of growing size.
+
+Does not need haddock3, each size is written by synthetic_haddock.py to a temporary directory
+and read by the generator with its --static reader.
+For each stage the best wall time of a number of repeats and the peak traced memory is reported.
+"""
+import argparse
+import importlib
+from io import StringIO
+import json
+import logging
+from pathlib import Path
+import sys
+from tempfile import TemporaryDirectory
+from time import perf_counter
+import tracemalloc
+
+here = Path(__file__).resolve().parent
+sys.path.insert(0, str(here.parent))
+sys.path.insert(0, str(here))
+
+import generate_haddock3_catalog as generator
+from synthetic_haddock import write_package
+
+
+def measure(fn, repeats):
+    """Best wall time in seconds over repeats and peak memory in bytes of single traced run"""
+    best = float('inf')
+    for _ in range(repeats):
+        start = perf_counter()
+        fn()
+        best = min(best, perf_counter() - start)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+def load(root):
+    # find_spec caches directories, so new package is found after each write
+    sys.path.insert(0, str(root))
+    importlib.invalidate_caches()
+    try:
+        located = generator.locate_haddock3_static()
+        return generator.load_sources(located, generator.empty_manifest())
+    finally:
+        sys.path.remove(str(root))
+
+
+def build(sources):
+    """Full pipeline without reading or writing files"""
+    for module in sources['modules']:
+        module['nodes'] = {}
+    sources['global']['nodes'] = {}
+    generator.process_nodes(sources['modules'], sources['levels'])
+    for level in sources['levels']:
+        generator.dump_catalog(generator.process_level(sources, level), StringIO())
+
+
+def benchmark_size(nr_modules, nr_params, nr_indices, repeats):
+    with TemporaryDirectory() as root:
+        write_package(root, nr_modules, nr_params, nr_indices)
+        results = {'load': measure(lambda: load(root), repeats)}
+        sources = load(root)
+    configs = [m['config'] for m in sources['modules']] + [sources['global']['config']]
+    levels = list(sources['levels'].values())
+    filtered = [generator.filter_on_level(c, level) for c in configs for level in levels]
+
+    results['filter_on_level'] = measure(lambda: [generator.filter_on_level(c, level) for c in configs for level in levels], repeats)
+    results['collapse_expandable'] = measure(lambda: [generator.collapse_expandable(c) for c in filtered], repeats)
+    results['config2schema'] = measure(lambda: [generator.config2schema(c) for c in filtered], repeats)
+    results['process_level'] = measure(lambda: build(sources), repeats)
+    return results
+
+
+def argparser_builder():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--modules', type=int, nargs='+', default=[10, 20, 40, 80], help='Number of modules of each size')
+    parser.add_argument('--params', type=int, default=40, help='Number of parameters per module')
+    parser.add_argument('--indices', type=int, default=3, help='Highest index of expandable parameters')
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--json', type=Path, help='Write results to JSON file, to compare runs')
+    return parser
+
+
+def main(argv=sys.argv[1:]):
+    args = argparser_builder().parse_args(argv)
+    # Progress messages of generator would dominate the timings
+    logging.disable(logging.WARNING)
+    results = []
+    print(f'{"modules":>8} {"params":>7} {"stage":<20} {"time (ms)":>10} {"peak (KiB)":>11}')
+    for nr_modules in args.modules:
+        stages = benchmark_size(nr_modules, args.params, args.indices, args.repeats)
+        for stage, (seconds, peak) in stages.items():
+            print(f'{nr_modules:>8} {args.params:>7} {stage:<20} {seconds * 1000:>10.1f} {peak / 1024:>11.0f}')
+            results.append({
+                'modules': nr_modules,
+                'params': args.params,
+                'indices': args.indices,
+                'stage': stage,
+                'seconds': seconds,
+                'peak_bytes': peak,
+            })
+    if args.json:
+        with args.json.open('w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""Write a synthetic haddock3 package, a stand-in for haddock3 to run the catalog generator against.
+
+The package has the same layout as haddock3 (haddock.modules.<category>.<module> with a defaults.yaml,
+haddock.gear.parameters with mandatory and optional yaml files)
+and the modules have parameters of each shape the generator handles.
+"""
+import argparse
+from pathlib import Path
+import random
+from yaml import dump
+
+categories = ['topology', 'sampling', 'refinement', 'scoring', 'analysis', 'extras']
+levels = ['easy', 'expert', 'guru', 'hidden']
+
+
+def param(title, type_, explevel='easy', group='module', **extra):
+    p = {
+        'title': title,
+        'short': f'Short description of {title}',
+        'long': f'Long description of {title}. ' * 4,
+        'group': group,
+        'explevel': explevel,
+        'type': type_,
+    }
+    p.update(extra)
+    return p
+
+
+def module_config(rng, nr_params, nr_indices=3):
+    """Config with nr_params parameters, cycling through the parameter shapes.
+
+    Expandable parameters get indices up to nr_indices.
+    """
+    config = {}
+    for i in range(nr_params):
+        level = rng.choice(levels)
+        kind = i % 8
+        if kind == 0:
+            config[f'fparam{i}'] = param(f'Float {i}', 'float', level, default=1.5, min=0, max=10)
+        elif kind == 1:
+            config[f'iparam{i}'] = param(f'Integer {i}', 'integer', level, default=3, min=0, max=100)
+        elif kind == 2:
+            config[f'bparam{i}'] = param(f'Boolean {i}', 'boolean', level, default=True)
+        elif kind == 3:
+            config[f'sparam{i}'] = param(f'String {i}', 'string', level, default='a', choices=['a', 'b', 'c'], minchars=0, maxchars=10)
+        elif kind == 4:
+            # array of scalars, X_1
+            for n in range(1, nr_indices + 1):
+                config[f'xpar{i}_{n}'] = param(f'Expandable scalar {i}', 'float', level, group='distance', default=1.0)
+        elif kind == 5:
+            # array of objects, X_Y_1
+            for n in range(1, nr_indices + 1):
+                config[f'ncs{i}_sta1_{n}'] = param('Start residue number', 'integer', level, group='symmetry', default=1)
+                config[f'ncs{i}_seg1_{n}'] = param('Segment ID', 'string', level, group='symmetry', default='')
+        elif kind == 6:
+            # array of arrays of objects, X_Y_1_1
+            for m in range(1, nr_indices + 1):
+                for n in range(1, nr_indices + 1):
+                    config[f'seg{i}_sta_{m}_{n}'] = param('Starting residue number', 'integer', level, group='flexibility', default=1)
+                    config[f'seg{i}_end_{m}_{n}'] = param('End residue number', 'integer', level, group='flexibility', default=2)
+        elif kind == 7:
+            config[f'fpath{i}'] = param(f'File {i}', 'file', level, default='', accept=['.tbl', '.txt'])
+    config['mol_shape_1'] = param('Shape', 'boolean', 'expert', group='molecule', default=False)
+    config['mol_fix_origin_1'] = param('Fix origin', 'boolean', 'expert', group='molecule', default=False)
+    config['resdic_'] = param('Residues per chain', 'list', 'guru', group='molecule', default=[], minitems=0, maxitems=100)
+    config['elecflag'] = param('Electrostatics', 'boolean', 'easy', default=True)
+    config['dielec'] = param('Dielectric', 'string', 'easy', default='cdie', choices=['cdie', 'rdie'])
+    # Generator supports one incompatible block per module
+    config['solvshell'] = param('Solvent shell', 'boolean', 'expert', default=False, incompatible={False: {'dielec': 'rdie'}})
+    return config
+
+
+def topology_config():
+    """Config of topoaa with a mol1 dict parameter"""
+    return {
+        'autohis': param('Automatic HIS protonation state', 'boolean', 'easy', default=True),
+        'limit': param('Limit', 'boolean', 'guru', default=True),
+        'mol1': {
+            'title': 'Input molecule configuration',
+            'short': 'Parameters for each input molecule',
+            'long': 'Long text',
+            'group': 'molecule',
+            'explevel': 'easy',
+            'type': 'dict',
+            'prot_segid': param('Segment ID', 'string', 'easy', default='A', minchars=0, maxchars=4),
+            'cyclicpept': param('Cyclic peptide', 'boolean', 'expert', default=False),
+            'nhisd': param('Number of HISD', 'integer', 'guru', default=0, min=0, max=100),
+            'hisd_1': param('Residue number', 'integer', 'guru', default=1),
+            'hisd_2': param('Residue number', 'integer', 'guru', default=1),
+            'seg_sta_1_1': param('Start residue number', 'integer', 'expert', default=1),
+            'seg_end_1_1': param('End residue number', 'integer', 'expert', default=1),
+        },
+    }
+
+
+def global_configs():
+    mandatory = {
+        'run_dir': param('Run directory', 'dir', 'easy', default='run1'),
+        'molecules': param('Input Molecules', 'list', 'easy', default=[], minitems=1, maxitems=20, accept=['.pdb']),
+    }
+    optional = {
+        'preprocess': param('Preprocess', 'boolean', 'easy', default=False),
+        'mode': param('Mode', 'string', 'easy', default='local', choices=['local', 'batch']),
+        'debug': param('Debug', 'boolean', 'guru', default=False, incompatible={False: {'mode': 'batch'}}),
+    }
+    modules_defaults = {
+        'ncores': param('Number of cores', 'integer', 'easy', default=4, min=1, max=500),
+        'cns_exec': param('CNS executable', 'file', 'guru', default=''),
+        'clean': param('Clean', 'boolean', 'expert', default=True),
+        'offline': param('Offline', 'boolean', 'hidden', default=False),
+    }
+    return mandatory, optional, modules_defaults
+
+
+def write_yaml(data, file):
+    with open(file, 'w') as f:
+        dump(data, f, sort_keys=False)
+
+
+def write_package(root, nr_modules=10, nr_params=40, nr_indices=3, seed=42):
+    """Write haddock package to root directory, returns path to package"""
+    rng = random.Random(seed)
+    haddock = Path(root) / 'haddock'
+    for subdir in ('modules', 'gear', 'core'):
+        (haddock / subdir).mkdir(parents=True, exist_ok=True)
+    (haddock / '__init__.py').write_text(
+        '"""HADDOCK3 library (synthetic)."""\n'
+        'config_expert_levels = ("easy", "expert", "guru")\n'
+        '_hidden_level = "hidden"\n'
+    )
+    (haddock / 'modules' / '__init__.py').write_text(
+        '"""HADDOCK3 modules."""\n'
+        'from pathlib import Path\n\n'
+        'modules_folder = Path(__file__).resolve().parent\n'
+        "_folder_match_regex = '[a-zA-Z]*/'\n"
+        'modules_category = {\n'
+        '    module.name: category.name\n'
+        '    for category in modules_folder.glob(_folder_match_regex)\n'
+        '    for module in category.glob(_folder_match_regex)\n'
+        '}\n'
+        f'category_hierarchy = {categories!r}\n'
+        'modules_defaults_path = Path(modules_folder, "defaults.yaml")\n'
+    )
+    (haddock / 'gear' / '__init__.py').write_text('"""Gear."""\n')
+    (haddock / 'core' / '__init__.py').write_text('"""Core."""\n')
+    (haddock / 'gear' / 'parameters.py').write_text(
+        '"""Parameters."""\n'
+        'from pathlib import Path\n\n'
+        'core_path = Path(__file__).resolve().parent.parent / "core"\n'
+        'MANDATORY_YAML = Path(core_path, "mandatory.yaml")\n'
+        'OPTIONAL_YAML = Path(core_path, "optional.yaml")\n'
+    )
+    mandatory, optional, modules_defaults = global_configs()
+    write_yaml(mandatory, haddock / 'core' / 'mandatory.yaml')
+    write_yaml(optional, haddock / 'core' / 'optional.yaml')
+    write_yaml(modules_defaults, haddock / 'modules' / 'defaults.yaml')
+    for category in categories:
+        category_dir = haddock / 'modules' / category
+        category_dir.mkdir(exist_ok=True)
+        (category_dir / '__init__.py').write_text(f'"""HADDOCK3 modules for {category}."""\n')
+    for i in range(nr_modules):
+        category = categories[i % len(categories)]
+        name = f'{category[:4]}mod{i}'
+        if i == 0:
+            name, category = 'topoaa', 'topology'
+        module_dir = haddock / 'modules' / category / name
+        module_dir.mkdir(exist_ok=True)
+        (module_dir / '__init__.py').write_text(
+            f'"""\nSynthetic module {name}.\n\nMore text.\n"""\n'
+            'from pathlib import Path\n\n'
+            'RECIPE_PATH = Path(__file__).resolve().parent\n'
+            'DEFAULT_CONFIG = Path(RECIPE_PATH, "defaults.yaml")\n\n\n'
+            'class HaddockModule:\n'
+            f'    """HADDOCK3 module {name}."""\n'
+        )
+        config = topology_config() if name == 'topoaa' else module_config(rng, nr_params, nr_indices)
+        write_yaml(config, module_dir / 'defaults.yaml')
+    return haddock
+
+
+def argparser_builder():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('root', type=Path, help='Directory to write haddock package in')
+    parser.add_argument('--modules', type=int, default=10)
+    parser.add_argument('--params', type=int, default=40)
+    parser.add_argument('--indices', type=int, default=3, help='Highest index of expandable parameters')
+    parser.add_argument('--seed', type=int, default=42)
+    return parser
+
+
+if __name__ == '__main__':
+    args = argparser_builder().parse_args()
+    write_package(args.root, args.modules, args.params, args.indices, args.seed)
@@ -1,17 +1,35 @@
 #!/usr/bin/env python3
 
 import argparse
+import ast
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from copy import deepcopy
+import cProfile
+from functools import partial
+import gzip
+import hashlib
 import importlib
+import importlib.metadata
+import importlib.util
+from io import StringIO
+from itertools import zip_longest
 import json
 import logging
 from math import isnan
+import os
 from pathlib import Path
 import re
+import shutil
 import sys
-from yaml import dump, load, Loader
-
-from haddock.modules import modules_category
-from haddock import config_expert_levels, _hidden_level
+from time import perf_counter, sleep
+import tracemalloc
+from yaml import dump, load, Dumper as PyDumper, Loader as PyLoader
+try:
+    # libyaml based loader and dumper are much faster than the pure Python ones
+    from yaml import CDumper as Dumper, CLoader as Loader
+except ImportError:
+    Dumper, Loader = PyDumper, PyLoader
 
 expandable_titles = {
     'mol_shape': 'Shape(s)',
@@ -29,12 +47,175 @@ expandable_titles = {
     "fle": "Fully flexible segments",
 }
 
+class Stats:
+    """Wall time and peak memory of each stage per module, see --stats_json.
+
+    Stages are recorded with `stage()` on the module set with `module()`.
+    Peak memory is only recorded while tracemalloc is tracing.
+    """
+    def __init__(self):
+        self.modules = {}
+        self.levels = {}
+        self.current_module = None
+        self.current_level = None
+        self.enabled = True
+        # Peak traced memory seen so far by each stage being recorded, innermost last
+        self.peaks = []
+
+    def entry(self):
+        return self.modules.setdefault(self.current_module or 'catalog', {})
+
+    @contextmanager
+    def module(self, name):
+        previous, self.current_module = self.current_module, name
+        try:
+            yield
+        finally:
+            self.current_module = previous
+
+    @contextmanager
+    def level(self, name):
+        previous, self.current_level = self.current_level, name
+        try:
+            yield
+        finally:
+            self.current_level = previous
+
+    @contextmanager
+    def disabled(self):
+        previous, self.enabled = self.enabled, False
+        try:
+            yield
+        finally:
+            self.enabled = previous
+
+    @contextmanager
+    def stage(self, name):
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            if self.peaks:
+                # Peak is reset for this stage, so keep what the enclosing stage reached until now
+                self.peaks[-1] = max(self.peaks[-1], peak)
+            tracemalloc.reset_peak()
+            self.peaks.append(current)
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            seconds = perf_counter() - start
+            peak_bytes = None
+            if tracing:
+                peak = max(tracemalloc.get_traced_memory()[1], self.peaks.pop())
+                peak_bytes = peak - current
+                if self.peaks:
+                    self.peaks[-1] = max(self.peaks[-1], peak)
+            if self.enabled:
+                record = self.entry().setdefault(name, {'calls': 0, 'seconds': 0.0})
+                record['calls'] += 1
+                record['seconds'] += seconds
+                if peak_bytes is not None:
+                    record['peak_bytes'] = max(record.get('peak_bytes', 0), peak_bytes)
+
+    def count(self, name, value=1):
+        if self.enabled:
+            entry = self.entry()
+            entry[name] = entry.get(name, 0) + value
+
+    def add_output(self, nr_bytes):
+        """Record bytes written for current module on current level"""
+        if self.enabled and self.current_level is not None:
+            output = self.entry().setdefault('output_bytes', {})
+            output[self.current_level] = output.get(self.current_level, 0) + nr_bytes
+
+    def merge(self, modules):
+        """Add stats of modules collected in another process"""
+        for name, entry in modules.items():
+            own = self.modules.setdefault(name, {})
+            for key, value in entry.items():
+                if isinstance(value, int):
+                    own[key] = own.get(key, 0) + value
+                else:
+                    own_value = own.setdefault(key, {})
+                    for key2, value2 in value.items():
+                        if key2 == 'peak_bytes':
+                            own_value[key2] = max(own_value.get(key2, 0), value2)
+                        else:
+                            own_value[key2] = own_value.get(key2, 0) + value2
+
+    def write(self, file, seconds):
+        with file.open('w') as f:
+            json.dump({
+                'seconds': seconds,
+                'levels': self.levels,
+                'modules': self.modules,
+            }, f, indent=2)
+        logging.warning(f'Written {file}')
+
+stats = Stats()
+
+def gzip_compress(data):
+    # Without timestamp, so same catalog gives same bytes
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+def brotli_compress(data):
+    try:
+        import brotli
+    except ImportError as e:
+        raise ImportError('Brotli compression requires the brotli package, install it with `pip install brotli`') from e
+    return brotli.compress(data)
+
+compressions = {
+    'gzip': ('.gz', gzip_compress),
+    'brotli': ('.br', brotli_compress),
+}
+
 def argparser_builder():
     parser = argparse.ArgumentParser()
     parser.add_argument('--out_dir', type=Path, default='public/catalog')
     parser.add_argument('--root_url', type=Path, default='/catalog')
+    parser.add_argument('--jobs', type=int, default=1, help='Number of processes to convert modules with')
+    parser.add_argument('--manifest', type=Path, default='.cache/manifest.json', help='File to keep hashes of inputs and their nodes in between runs, keep it outside of out_dir as it is not needed by the builder')
+    parser.add_argument('--rebuild', action='store_true', help='Ignore manifest of previous run and convert all modules')
+    parser.add_argument('--static', action='store_true', help='Read haddock3 package from disk instead of importing it')
+    parser.add_argument('--check_yaml', action='store_true', help='Check libyaml and pure Python dumper write same bytes')
+    parser.add_argument('--check', action='store_true', help='Check schemas against JSON schema meta schema, ui and toml schemas against schemas and defaults against schemas before writing (requires jsonschema)')
+    parser.add_argument('--check_defaults', action='store_true', help='Check defaults of global and nodes match the form data rjsf derives from their schemas')
+    parser.add_argument('--format', nargs='+', choices=['yaml', 'json'], default=['yaml'], help='Formats to write catalogs in, index.json points to first')
+    parser.add_argument('--compress', nargs='+', choices=list(compressions), default=[], help='Also write precompressed catalog files')
+    parser.add_argument('--shard', action='store_true', help='Write skeleton catalogs with schemas of each node in own file')
+    parser.add_argument('--dedup', action='store_true', help='Move sub schemas used multiple times to $defs of catalog')
+    parser.add_argument('--master', action='store_true', help='Write single catalog annotated with explevels instead of a catalog per level')
+    parser.add_argument('--hashed_names', action='store_true', help='Also write level files and examples with content hash in name and point index.json to them')
+    parser.add_argument('--search_index', action='store_true', help='Also write haddock3.<level>.search.json with an inverted index of the parameter texts')
+    parser.add_argument('--patch_from', type=Path, help='Dir with catalogs of previous version, writes JSON Patches from them to new catalogs and version chain to versions.json')
+    parser.add_argument('--watch', action='store_true', help='After generating, keep polling the defaults.yaml files and regenerate catalogs of changed modules')
+    parser.add_argument('--poll_interval', type=float, default=0.5, help='Seconds between checks for changed files in watch mode')
+    parser.add_argument('--stats_json', type=Path, help='Write time, peak memory and output bytes of each stage per module to JSON file, traces memory allocations with tracemalloc which slows down the run')
+    parser.add_argument('--profile', type=Path, help='Write cProfile stats of main process to file')
     return parser
 
+class ModuleProcessingError(Exception):
+    """Raised when a haddock3 module could not be converted to a catalog node"""
+
+def without_group(param):
+    """Copy of parameter without group, so the (cached) config it came from stays untouched"""
+    return {k: v for k, v in param.items() if k != 'group'}
+
+def expandable_name(key):
+    """Split parameter name into name and at most 2 trailing indices.
+
+    For example `rair_sta_20_1` gives `('rair_sta', ['20', '1'])` and `ambig_fname` gives `('ambig_fname', [])`.
+    """
+    tokens = key.split('_')
+    nr_indices = 0
+    while nr_indices < 2 and nr_indices < len(tokens) - 1 and tokens[-1 - nr_indices].isdecimal():
+        nr_indices += 1
+    name = '_'.join(tokens[:len(tokens) - nr_indices])
+    if not name:
+        return key, []
+    return name, tokens[len(tokens) - nr_indices:]
+
 def collapse_expandable(config):
     """
     The haddock3 defaults.yaml files define complex shape inside the parameter name.
@@ -46,69 +227,56 @@ def collapse_expandable(config):
     3. array of arrays of scalars (X_1_1 -> X:[[1]]) and
     4. array of arrays of object (X_Y_1_1 -> X:[[{Y}]])
 
+    Each name is split once into name and indices, see expandable_name.
+    The schema is taken from the parameter with all indices being 1,
+    the highest index of each dimension is stored in maxindices when it is above 1.
     """
-    array_of_scalar = r'(\w+)_1'
-    array_of_object = r'(\w+)_(\w+)_1'
-    array_of_array_of_scalar = r'(\w+)_1_1'
-    array_of_array_of_object = r'(\w+)_(\w+)_1_1'
-    skip = r'\w+?(_\d\d?)(_\d\d?)?'
     must_be_array_of_scalar = {'mol_fix_origin_1', 'mol_shape_1'}
     new_config = {}
+    highest = {}
     for k, v in config.items():
         logging.info(f'Processing var: {k}')
-        if (match := re.match(skip, k)) and not (match.groups()[0] == '_1' and (match.groups()[1] in {None,'_1'})):
-            logging.info(f'SKipping {k} as their schema will be captured by first index.')
+        name, indices = expandable_name(k)
+        if not indices:
+            new_config[k] = v
             continue
-            # TODO nice to store maxitems with type:array
-            # for example rair_end_20_1 -> outer array should have maxitems:20
-            # for example int_20_20 ->  both array should have maxitems:20
-        elif match := re.match(array_of_array_of_object, k):
-            p, n = match.groups()
-            if p not in new_config:
-                new_config[p] = {
-                    'dim': 2,
-                    'properties': {},
-                    'type': 'list',
-                    'maxItemsFrom': 'molecules'
-                }
-            new_config[p]['properties'][n] = v
-            if 'group' in v:
-                # Move group from nested prop to outer array
-                new_config[p]['group'] = v['group']
-                del v['group']
-        elif match := re.match(array_of_array_of_scalar, k):
-            p, = match.groups()
+        dim = len(indices)
+        *prefix, last = name.split('_')
+        if prefix and not (dim == 1 and f'{name}_1' in must_be_array_of_scalar):
+            # array of objects or array of arrays of objects
+            p, n = '_'.join(prefix), last
+        else:
+            # array of scalars or array of arrays of scalars
+            p, n = name, None
+        highest[p] = [max(h, int(i)) for h, i in zip(highest.get(p, [0] * dim), indices)]
+        if any(i != '1' for i in indices):
+            logging.info(f'Skipping {k} as their schema will be captured by first index.')
+            stats.count('skipped_keys')
+            continue
+        if n is None:
             new_config[p] = {
                 'type': 'list',
-                'dim': 2,
-                'items': v
+                'dim': dim,
+                'items': without_group(v)
             }
+            if dim == 1 and k.startswith('mol_'):
+                new_config[p]['maxItemsFrom'] = 'molecules'
             if 'group' in v:
                 new_config[p]['group'] = v['group']
-                del v['group']
-        elif (match := re.match(array_of_object, k)) and k not in must_be_array_of_scalar:
-            p, n = match.groups()
+        else:
             if p not in new_config:
-                new_config[p] = {'dim': 1, 'properties': {}, 'type': 'list'}
-            new_config[p]['properties'][n] = v
-            if 'group' in v:
-                new_config[p]['group'] = v['group']
-                del v['group']
-        elif match := re.match(array_of_scalar, k):
-            p, = match.groups()
-            new_config[p] = {
-                'type': 'list',
-                'dim': 1,
-                'items': v
-            }
-            if k.startswith('mol_'):
-                new_config[p]['maxItemsFrom'] = 'molecules'
+                new_config[p] = {'dim': dim, 'properties': {}, 'type': 'list'}
+                if dim == 2:
+                    new_config[p]['maxItemsFrom'] = 'molecules'
             if 'group' in v:
+                # Move group from nested prop to outer array
                 new_config[p]['group'] = v['group']
-                del v['group']
-        else:
-            new_config[k] = v
+                v = without_group(v)
+            new_config[p]['properties'][n] = v
 
+    for p, maxima in highest.items():
+        if p in new_config and 'dim' in new_config[p] and max(maxima) > 1:
+            new_config[p]['maxindices'] = maxima
     return new_config
 
 def residue_like(schema):
@@ -124,7 +292,8 @@ def config2schema(config):
     tomlSchema = {}
 
     required = []
-    collapsed_config = collapse_expandable(config)
+    with stats.stage('collapse_expandable'):
+        collapsed_config = collapse_expandable(config)
     ifthenelses = {}
     for k, v in collapsed_config.items():
         prop = {}
@@ -196,7 +365,9 @@ def config2schema(config):
                     k3:v3 for k3,v3 in v2.items() if k3 not in {'group','explevel'}
                 } for k2,v2 in v.items() if k2 not in {'explevel', 'title', 'short', 'long', 'group', 'type'}
             }
-            schemas = config2schema(collapse_expandable(config2))
+            with stats.stage('collapse_expandable'):
+                collapsed_config2 = collapse_expandable(config2)
+            schemas = config2schema(collapsed_config2)
             prop.update({
                 'type': 'array',
                 'items': schemas['schema'],
@@ -305,6 +476,8 @@ def config2schema(config):
             elif 'maxItemsFrom' in v:
                 prop['maxItemsFrom'] = v['maxItemsFrom']
                 prop_ui['ui:indexable'] = True
+            if v.get('maxindices', [1])[0] > 1:
+                prop['maxItems'] = v['maxindices'][0]
             if 'title' not in v and k in expandable_titles:
                 prop['title'] = expandable_titles[k]
             if 'properties' in v:
@@ -414,6 +587,8 @@ def config2schema(config):
                 prop['uniqueItems'] = True
             else:
                 raise ValueError(f"Don't know how to determine type of items of {v} from {k}")
+            if v.get('dim') == 2 and v.get('maxindices', [1, 1])[1] > 1:
+                prop['items']['maxItems'] = v['maxindices'][1]
         else:
             raise ValueError(f"Don't know what to do with {k}:{v}")
         if k not in ifthenelses:
@@ -445,16 +620,111 @@ def config2schema(config):
         "tomlSchema": tomlSchema,
     }
 
-def filter_on_level(config, level):
+def schema_properties(schema):
+    """Properties of object schema including the ones in then and else blocks"""
+    properties = dict(schema.get('properties', {}))
+    for key in ('then', 'else'):
+        if isinstance(schema.get(key), dict):
+            properties.update(schema[key].get('properties', {}))
+    return properties
+
+def schema_type(schema):
+    if 'type' in schema:
+        return schema['type']
+    if 'properties' in schema or 'additionalProperties' in schema:
+        return 'object'
+    return None
+
+def is_multi_select(schema):
+    items = schema.get('items')
+    return schema.get('uniqueItems', False) and isinstance(items, dict) and 'enum' in items
+
+def compute_defaults(schema, default=None):
+    """Default value of schema like computeDefaults of rjsf v4 returns it, None when there is no default.
+
+    A default of a parent object is overwritten by the default of the schema,
+    arrays shorter than minItems are padded with defaults of their items.
+    """
+    if isinstance(default, dict) and isinstance(schema.get('default'), dict):
+        default = default | schema['default']
+    elif 'default' in schema:
+        default = schema['default']
+    type_ = schema_type(schema)
+    if type_ == 'object':
+        parent = default if isinstance(default, dict) else {}
+        values = {}
+        for key, prop in schema.get('properties', {}).items():
+            value = compute_defaults(prop, parent.get(key))
+            if value is not None:
+                values[key] = value
+        return values
+    if type_ == 'array':
+        items = schema.get('items', {})
+        if isinstance(default, list) and isinstance(items, list):
+            default = [compute_defaults(items[i] if i < len(items) else schema.get('additionalItems', {}), item) for i, item in enumerate(default)]
+        if schema.get('minItems'):
+            if is_multi_select(schema):
+                return default if default is not None else []
+            filled = default if default is not None else []
+            if schema['minItems'] > len(filled):
+                filler = schema.get('additionalItems', {}) if isinstance(items, list) else items
+                return filled + [compute_defaults(filler) for _ in range(schema['minItems'] - len(filled))]
+    return default
+
+def condition_holds(condition, data):
+    """Whether data is valid against the `if` schema written for `incompatible`, which only has properties with a const"""
+    for key, prop in condition.get('properties', {}).items():
+        if set(prop) != {'const'}:
+            raise ValueError(f'Can not evaluate condition on {key}: {prop}')
+        if key in data and data[key] != prop['const']:
+            return False
+    return True
+
+def without_placeholders(defaults):
+    """Defaults without the None items rjsf pads arrays up to minItems with.
+
+    The placeholders are not values a workflow can use (`molecules: [null]`),
+    rjsf pads the arrays again when it renders the form.
+    Keys whose array only had placeholders are left out.
+    """
+    result = {}
+    for key, value in defaults.items():
+        if isinstance(value, list):
+            value = [item for item in value if item is not None]
+            if not value:
+                continue
+        result[key] = value
+    return result
+
+def schema_defaults(schema):
+    """Parameters with which rjsf fills an empty form of schema, without placeholders.
+
+    The builder copies them when a node is added instead of deriving them from the schema.
+    The if/then/else from `incompatible` is resolved against the defaults of the other parameters,
+    like rjsf does after it has rendered the form with those defaults.
+    Returned values are copies, so they do not become YAML aliases of the defaults in the schema.
+    """
+    unconditional = {k: v for k, v in schema.items() if k not in {'if', 'then', 'else'}}
+    defaults = compute_defaults(unconditional)
+    if 'if' in schema:
+        branch = schema['then'] if condition_holds(schema['if'], defaults) else schema['else']
+        defaults |= compute_defaults({'type': 'object', 'properties': branch.get('properties', {})})
+    return deepcopy(without_placeholders(defaults))
+
+def levels_upto(config_expert_levels, hidden_level):
+    """Map each level to the set of levels whose parameters are shown on that level"""
     # Each higher level should include parameters from previous level
+    levels = {}
     valid_levels = set()
     for l in config_expert_levels:
         valid_levels.add(l)
-        if l == level:
-            break
+        levels[l] = valid_levels - {hidden_level}
+    return levels
+
+def filter_on_level(config, valid_levels):
     filtered_config = {}
     for k, v in config.items():
-        if v['explevel'] in valid_levels and v['explevel'] != _hidden_level:
+        if v['explevel'] in valid_levels:
             filtered_v = v
             # topoaa.mol1 has some parameters that are easy and some that are expert
             # need to filter out the expert ones when level=easy
@@ -463,120 +733,1491 @@ def filter_on_level(config, level):
                 for k2, v2 in v.items():
                     if 'explevel' not in v2:
                         filtered_v[k2] = v2
-                    if 'explevel' in v2 and v2['explevel'] in valid_levels and v2['explevel'] != _hidden_level:
+                    if 'explevel' in v2 and v2['explevel'] in valid_levels:
                         filtered_v[k2] = v2
             filtered_config[k] = filtered_v
     return filtered_config
 
-def process_module(module_name, category, level):
-    logging.warning(f'Processing module: {module_name}')
-    package = f'haddock.modules.{category}.{module_name}'
-    module = importlib.import_module(package)
-    cls = module.HaddockModule
-    with open(module.DEFAULT_CONFIG) as f:
-        config = load(f, Loader=Loader)
-
-    config4level = filter_on_level(config, level)
-    schemas = config2schema(config4level)
-    label =  module.__doc__
+def sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+def generator_version():
+    """Hash of this script, any change to the conversion invalidates the manifest"""
+    return sha256(Path(__file__).read_bytes())
+
+def empty_manifest():
+    return {'nodes': {}, 'global': {}, 'levels': {}}
+
+def read_manifest(file):
+    if not file.exists():
+        return empty_manifest()
+    with file.open() as f:
+        manifest = json.load(f)
+    if manifest.get('generator') != generator_version():
+        logging.warning(f'Ignoring {file} as it was written by another version of generator')
+        return empty_manifest()
+    return manifest
+
+def module_label(doc):
+    label = doc
     # If multiline take first and second if first is empty
     if label.count('\n') > 1:
         lines =  label.splitlines()
         label = lines[0]
         if not label:
             label = lines[1]
+    return label
+
+def locate_haddock3():
+    """Find the haddock3 modules and parameter files by importing haddock3"""
+    haddock = importlib.import_module('haddock')
+    modules = importlib.import_module('haddock.modules')
+    parameters = importlib.import_module('haddock.gear.parameters')
+    located_modules = []
+    for module_name, category in sorted(modules.modules_category.items()):
+        with stats.module(module_name), stats.stage('import'):
+            module = importlib.import_module(f'haddock.modules.{category}.{module_name}')
+        located_modules.append({
+            'id': module_name,
+            'category': category,
+            'doc': module.__doc__,
+            'class_doc': module.HaddockModule.__doc__,
+            'config_file': Path(module.DEFAULT_CONFIG),
+        })
+    return {
+        'levels': levels_upto(haddock.config_expert_levels, haddock._hidden_level),
+        'categories': [
+            {
+                'name': category,
+                'doc': importlib.import_module(f'haddock.modules.{category}').__doc__,
+            } for category in modules.category_hierarchy
+        ],
+        'modules': located_modules,
+        'package_dir': Path(haddock.__file__).parent,
+        # Later files overwrite parameters of earlier ones
+        'global_files': [Path(parameters.MANDATORY_YAML), Path(parameters.OPTIONAL_YAML), Path(modules.modules_defaults_path)],
+    }
+
+def parse_python(file):
+    return ast.parse(file.read_text(), filename=str(file))
+
+def static_assignment(tree, name):
+    """Value node of top level `name = ...` in tree"""
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(isinstance(t, ast.Name) and t.id == name for t in node.targets):
+            return node.value
+    raise ValueError(f'Unable to find assignment of {name}')
+
+def static_path(tree, name, base_dir, package_dir):
+    """Path assigned to name like `name = Path(some_dir, "sub", "file.yaml")`.
+
+    The string parts are joined to base_dir, if that does not exist
+    the package_dir is searched for a file ending with the string parts.
+    """
+    parts = [n.value for n in ast.walk(static_assignment(tree, name)) if isinstance(n, ast.Constant) and isinstance(n.value, str)]
+    if not parts:
+        raise ValueError(f'Unable to determine path of {name}')
+    path = base_dir.joinpath(*parts)
+    if path.exists():
+        return path
+    for candidate in sorted(package_dir.rglob(parts[-1])):
+        if candidate.parts[-len(parts):] == tuple(parts):
+            return candidate
+    raise ValueError(f'Unable to find file of {name}, tried {path}')
+
+def static_docstring(tree, class_name=None):
+    """Docstring of module or of a class in module as __doc__ would give"""
+    if class_name is None:
+        return ast.get_docstring(tree, clean=False)
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef) and node.name == class_name:
+            return ast.get_docstring(node, clean=False)
+    logging.warning(f'Unable to find class {class_name}, using no docstring')
+    return None
+
+def static_subdirs(dir):
+    # Same as glob('[a-zA-Z]*/') in haddock.modules
+    return sorted(d for d in dir.iterdir() if d.is_dir() and re.match('[a-zA-Z]', d.name))
+
+def locate_haddock3_static():
+    """Find the haddock3 modules and parameter files without importing haddock3.
+
+    Reads the installed haddock3 package from disk, docstrings and paths are extracted
+    from the syntax tree of the Python files, so none of the haddock3 dependencies need to be installed.
+    """
+    spec = importlib.util.find_spec('haddock')
+    if spec is None or not spec.submodule_search_locations:
+        raise ModuleNotFoundError('Unable to find haddock3 package')
+    package_dir = Path(spec.submodule_search_locations[0])
+    haddock = parse_python(package_dir / '__init__.py')
+    modules_dir = package_dir / 'modules'
+    modules = parse_python(modules_dir / '__init__.py')
+    parameters = parse_python(package_dir / 'gear' / 'parameters.py')
+
+    located_modules = []
+    for category_dir in static_subdirs(modules_dir):
+        for module_dir in static_subdirs(category_dir):
+            with stats.module(module_dir.name), stats.stage('import'):
+                module = parse_python(module_dir / '__init__.py')
+            located_modules.append({
+                'id': module_dir.name,
+                'category': category_dir.name,
+                'doc': static_docstring(module),
+                'class_doc': static_docstring(module, 'HaddockModule'),
+                'config_file': static_path(module, 'DEFAULT_CONFIG', module_dir, package_dir),
+            })
+    located_modules.sort(key=lambda m: (m['id'], m['category']))
+    # Same as modules_category dict, where last module with same name wins
+    located_modules = list({m['id']: m for m in located_modules}.values())
+    return {
+        'levels': levels_upto(
+            ast.literal_eval(static_assignment(haddock, 'config_expert_levels')),
+            ast.literal_eval(static_assignment(haddock, '_hidden_level')),
+        ),
+        'categories': [
+            {
+                'name': category,
+                'doc': static_docstring(parse_python(modules_dir / category / '__init__.py')),
+            } for category in ast.literal_eval(static_assignment(modules, 'category_hierarchy'))
+        ],
+        'modules': located_modules,
+        'package_dir': package_dir,
+        'global_files': [
+            static_path(parameters, 'MANDATORY_YAML', package_dir, package_dir),
+            static_path(parameters, 'OPTIONAL_YAML', package_dir, package_dir),
+            static_path(modules, 'modules_defaults_path', modules_dir, package_dir),
+        ],
+    }
+
+def load_module(located, levels, manifest):
+    """Load DEFAULT_CONFIG of a haddock3 module once, so it can be used for every level
+
+    If the inputs of the module did not change since the manifest was written,
+    its nodes are taken from the manifest and the DEFAULT_CONFIG is not parsed.
+    """
+    logging.warning(f'Loading module: {located["id"]}')
+    config_bytes = located['config_file'].read_bytes()
+    info = {
+        "id": located['id'],
+        "category": located['category'],
+        "label": module_label(located['doc']),
+        "description": located['class_doc'],
+    }
+    config_digest = sha256(config_bytes)
+    # Path is left out of digest, so a reinstall of same haddock3 elsewhere can still use the manifest
+    info['digest'] = sha256(json.dumps([info, config_digest]).encode())
+    info['inputs'] = {str(located['config_file']): config_digest}
+    cached = manifest['nodes'].get(info['id'])
+    if cached and cached['digest'] == info['digest'] and levels.keys() <= cached['levels'].keys():
+        info['nodes'] = cached['levels']
+    else:
+        info['nodes'] = {}
+        with stats.module(info['id']), stats.stage('yaml_load'):
+            info['config'] = load(config_bytes, Loader=Loader)
+    return info
+
+def process_module(module, valid_levels):
+    logging.warning(f'Processing module: {module["id"]}')
+    with stats.module(module['id']):
+        with stats.stage('filter_on_level'):
+            config4level = filter_on_level(module['config'], valid_levels)
+        with stats.stage('config2schema'):
+            schemas = config2schema(config4level)
     # TODO add $schema and $id to schema
     return {
-        "id": module_name,
-        "category": category,
-        "label": label,
-        "description": cls.__doc__,
+        "id": module['id'],
+        "category": module['category'],
+        "label": module['label'],
+        "description": module['description'],
         "schema": schemas['schema'],
         "uiSchema": schemas['uiSchema'],
         "tomlSchema": schemas['tomlSchema'],
+        "defaults": schema_defaults(schemas['schema']),
     }
 
-def process_category(category):
-    package = f'haddock.modules.{category}'
-    module = importlib.import_module(package)
+def process_category(located):
     collapsed_categories = {'extras'}
     return {
-        'name': category,
-        'description': module.__doc__,
-        'collapsed': category in collapsed_categories,
+        'name': located['name'],
+        'description': located['doc'],
+        'collapsed': located['name'] in collapsed_categories,
     }
 
-def get_category_order():
-    return importlib.import_module('haddock.modules').category_hierarchy
+def load_global(files, levels, manifest):
+    """Load the generic parameters of haddock3
 
+    Like load_module the YAML files are only parsed when they changed since the manifest was written.
+    """
+    contents = [file.read_bytes() for file in files]
+    digests = [sha256(content) for content in contents]
+    info = {
+        "inputs": {str(file): digest for file, digest in zip(files, digests)},
+        "digest": sha256(json.dumps(digests).encode()),
+    }
+    cached = manifest['global']
+    if cached and cached['digest'] == info['digest'] and levels.keys() <= cached['levels'].keys():
+        info['nodes'] = cached['levels']
+    else:
+        info['nodes'] = {}
+        info['config'] = {}
+        for content in contents:
+            with stats.module('global'), stats.stage('yaml_load'):
+                info['config'] |= load(content, Loader=Loader)
+    return info
 
-def process_global(level):
-    package = 'haddock.modules'
-    module = importlib.import_module(package)
-    with open(module.modules_defaults_path) as f:
-        modules_defaults = load(f, Loader=Loader)
-    gmodule = importlib.import_module('haddock.gear.parameters')
-    with open(gmodule.MANDATORY_YAML) as f:
-        mandatory_parameters = load(f, Loader=Loader)
-    with open(gmodule.OPTIONAL_YAML) as f:
-        optional_parameters = load(f, Loader=Loader)
-    config = mandatory_parameters | optional_parameters | modules_defaults
-    config4level = filter_on_level(config, level)
-
-    schemas = config2schema(config4level)
+def process_global(config, valid_levels):
+    with stats.module('global'):
+        with stats.stage('filter_on_level'):
+            config4level = filter_on_level(config, valid_levels)
+        with stats.stage('config2schema'):
+            schemas = config2schema(config4level)
     # TODO add $schema and $id to schema
     return {
         "schema": schemas['schema'],
         "uiSchema": schemas['uiSchema'],
         "tomlSchema": schemas['tomlSchema'],
+        "defaults": schema_defaults(schemas['schema']),
     }
 
-def process_level(level_fn: Path, level: str):
-    category_list = get_category_order()
-    categories = [process_category(c) for c in category_list]
+def load_sources(located, manifest):
+    """Read everything the catalogs are derived from.
 
+    Each defaults.yaml is parsed only once,
+    the returned in-memory cache is then used to build all levels.
+    """
     broken_modules = {
         'exit', # Does not make sense to have exit module in the catalog
     }
+    levels = located['levels']
     # TODO define module order like category order
     # now they are sorted by insert
-    nodes = [process_module(module, category, level) for module, category in sorted(modules_category.items()) if module not in broken_modules]
+    modules = [load_module(module, levels, manifest) for module in located['modules'] if module['id'] not in broken_modules]
+    return {
+        'levels': levels,
+        'package_dir': located['package_dir'],
+        'categories': [process_category(c) for c in located['categories']],
+        'modules': modules,
+        'global': load_global(located['global_files'], levels, manifest),
+    }
+
+def process_module_collecting(module, valid_levels, trace=False):
+    """process_module in a worker process, returns node and the stats collected by the worker
+
+    With trace the worker traces memory allocations like the main process does for --stats_json.
+    """
+    global stats
+    stats = Stats()
+    if trace and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    return process_module(module, valid_levels), stats.modules
+
+def collected_result(future):
+    node, modules = future.result()
+    stats.merge(modules)
+    return node
+
+def process_nodes(modules, levels, jobs=1):
+    """Convert each module to a node for each level (see levels_upto) and store it in module['nodes'].
+
+    Modules which already have a node for a level are skipped.
+    With jobs > 1 the modules are converted in a process pool.
+    Results are collected in the order of modules,
+    so the output is the same as a serial run.
+    """
+    tasks = [(module, level, valid_levels) for level, valid_levels in levels.items() for module in modules if level not in module['nodes']]
+    executor = None
+    if jobs > 1 and tasks:
+        executor = ProcessPoolExecutor(max_workers=jobs)
+        trace = tracemalloc.is_tracing()
+        calls = [partial(collected_result, executor.submit(process_module_collecting, module, valid_levels, trace)) for module, _, valid_levels in tasks]
+    else:
+        calls = [partial(process_module, module, valid_levels) for module, _, valid_levels in tasks]
+    try:
+        for (module, level, _), call in zip(tasks, calls):
+            try:
+                module['nodes'][level] = call()
+            except Exception as e:
+                raise ModuleProcessingError(f'Failed to process module {module["id"]} on {level} level') from e
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+def process_level(sources, level):
+    nodes = [module['nodes'][level] for module in sources['modules']]
+    global_ = sources['global']
+    if level not in global_['nodes']:
+        global_['nodes'][level] = process_global(global_['config'], sources['levels'][level])
 
     # remove catagories without nodes
-    categories = [c for c in categories if any(n['category'] == c['name'] for n in nodes)]
+    categories = [c for c in sources['categories'] if any(n['category'] == c['name'] for n in nodes)]
 
-    catalog = {
+    return {
         "title": f"Haddock 3 on {level} level",
         "nodeLegend": "Module",
         "categories": categories,
-        'global': process_global(level),
+        'global': global_['nodes'][level],
         "nodes": nodes,
         "examples": {
             'docking-protein-ligand': '/examples/docking-protein-ligand.zip' # TODO get from somewhere instead of hardcoding it here
         }
     }
-    with level_fn.open('w') as f:
-        dump(catalog, f, sort_keys=False)
+
+def build_catalog(level, modules=None, static=False):
+    """Generate catalog of a level in memory, without reading or writing files in the output dir.
+
+    Args:
+        level: Name of level, like easy, expert or guru.
+        modules: Ids of modules to include as nodes, default is all modules.
+        static: Read haddock3 package from disk instead of importing it.
+
+    Returns:
+        The catalog as dict.
+    """
+    located = locate_haddock3_static() if static else locate_haddock3()
+    if level not in located['levels']:
+        raise ValueError(f'Level {level} not found, available are {", ".join(located["levels"])}')
+    if modules is not None:
+        unknown = set(modules) - {module['id'] for module in located['modules']}
+        if unknown:
+            raise ValueError(f'Modules {", ".join(sorted(unknown))} not found')
+        located['modules'] = [module for module in located['modules'] if module['id'] in modules]
+    located['levels'] = {level: located['levels'][level]}
+    sources = load_sources(located, empty_manifest())
+    process_nodes(sources['modules'], sources['levels'])
+    return process_level(sources, level)
+
+def haddock3_version():
+    """Version of installed haddock3 package or None when it is not installed as distribution"""
+    try:
+        return importlib.metadata.version('haddock3')
+    except importlib.metadata.PackageNotFoundError:
+        return None
+
+def libyaml_compatible(data):
+    """Whether libyaml dumper writes data same as pure Python dumper.
+
+    They wrap double quoted strings differently, which are used for strings
+    with non-ASCII or non-printable characters, and write empty or long keys differently.
+    """
+    if isinstance(data, str):
+        return data.isascii() and data.isprintable()
+    if isinstance(data, dict):
+        return all(
+            isinstance(k, str) and 0 < len(k) < 128 and libyaml_compatible(k) and libyaml_compatible(v)
+            for k, v in data.items()
+        )
+    if isinstance(data, list):
+        return all(libyaml_compatible(v) for v in data)
+    return True
+
+def dump_chunk(data, stream, Dumper):
+    if Dumper is not PyDumper and not libyaml_compatible(data):
+        Dumper = PyDumper
+    with stats.stage('dump'):
+        text = dump(data, Dumper=Dumper, sort_keys=False)
+    stream.write(text)
+    stats.add_output(len(text.encode()))
+
+def dump_catalog(catalog, stream, Dumper=Dumper):
+    """Write catalog as YAML to stream, one top level key and one node at a time.
+
+    Gives same document as `dump(catalog, stream, sort_keys=False)` with pure Python dumper,
+    without having the representation of whole catalog in memory.
+    Chunks which libyaml would write differently are written with the pure Python dumper.
+    """
+    for key, value in catalog.items():
+        if key == 'nodes' and value:
+            stream.write('nodes:\n')
+            for node in value:
+                with stats.module(node['id']):
+                    dump_chunk([node], stream, Dumper)
+        else:
+            with stats.module('global' if key == 'global' else None):
+                dump_chunk({key: value}, stream, Dumper)
+
+def dump_json_chunk(prefix, data, stream):
+    with stats.stage('dump'):
+        # JSON can not represent nan, so fail instead of writing a file browsers can not parse
+        text = prefix + json.dumps(data, separators=(',', ':'), allow_nan=False)
+    stream.write(text)
+    stats.add_output(len(text.encode()))
+
+def dump_json_catalog(catalog, stream):
+    """Write catalog as compact JSON to stream, one top level key and one node at a time.
+
+    Gives same document as `json.dump(catalog, stream, separators=(',', ':'))`,
+    with the bytes written for each node recorded in the stats like `dump_catalog` does for YAML.
+    """
+    separator = '{'
+    for key, value in catalog.items():
+        prefix = separator + json.dumps(key) + ':'
+        separator = ','
+        if key == 'nodes' and value:
+            stream.write(prefix)
+            for i, node in enumerate(value):
+                with stats.module(node['id']):
+                    dump_json_chunk('[' if i == 0 else ',', node, stream)
+            stream.write(']')
+        else:
+            with stats.module('global' if key == 'global' else None):
+                dump_json_chunk(prefix, value, stream)
+    stream.write('{}' if separator == '{' else '}')
+
+def dumps_catalog(catalog, format='yaml'):
+    """Catalog as YAML or JSON string, same as written to a file by write_catalog"""
+    if format == 'json':
+        return json.dumps(catalog, separators=(',', ':'), allow_nan=False)
+    stream = StringIO()
+    dump_catalog(catalog, stream)
+    return stream.getvalue()
+
+def check_dumpers(catalog):
+    """Raise error when libyaml dumper does not give same bytes as pure Python dumper"""
+    if Dumper is PyDumper:
+        logging.warning('Skipping YAML check, libyaml is not available')
+        return
+    outputs = []
+    for dumper in (Dumper, PyDumper):
+        stream = StringIO()
+        with stats.disabled():
+            dump_catalog(catalog, stream, Dumper=dumper)
+        outputs.append(stream.getvalue())
+    if outputs[0] != outputs[1]:
+        lines = zip_longest(outputs[0].splitlines(), outputs[1].splitlines())
+        nr, (cline, pyline) = next((i, l) for i, l in enumerate(lines, 1) if l[0] != l[1])
+        raise ValueError(f'libyaml and pure Python dumper differ at line {nr}: {cline!r} != {pyline!r}')
+
+def merge_defaults_with_form_data(defaults, form_data):
+    """Like mergeDefaultsWithFormData of rjsf v4, form data wins over defaults"""
+    if isinstance(form_data, list):
+        defaults = defaults if isinstance(defaults, list) else []
+        return [merge_defaults_with_form_data(defaults[i] if i < len(defaults) else None, v) for i, v in enumerate(form_data)]
+    if isinstance(form_data, dict):
+        merged = dict(defaults) if isinstance(defaults, dict) else {}
+        for key, value in form_data.items():
+            merged[key] = merge_defaults_with_form_data(merged.get(key), value)
+        return merged
+    return form_data
+
+def merge_schemas(left, right):
+    """Like mergeSchemas of rjsf v4, used to add then or else branch to schema"""
+    merged = dict(left)
+    for key, value in right.items():
+        if key in left and isinstance(value, dict):
+            merged[key] = merge_schemas(left[key], value)
+        elif key == 'required' and isinstance(left.get(key), list) and isinstance(value, list):
+            merged[key] = left[key] + [v for v in value if v not in left[key]]
+        else:
+            merged[key] = value
+    return merged
+
+def merge_objects(left, right):
+    """Like mergeObjects of rjsf v4, nested objects are merged and other values of right win"""
+    merged = dict(left)
+    for key, value in right.items():
+        if isinstance(value, dict) and isinstance(left.get(key), dict):
+            merged[key] = merge_objects(left[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+def rjsf_compute_defaults(schema, parent_defaults=None, form_data=None):
+    """Port of computeDefaults of rjsf v4 for the schemas the generator writes.
+
+    Kept apart from compute_defaults, which the catalog defaults are made with, so the check does not share its code.
+    None stands for undefined. $ref, dependencies, oneOf and anyOf are not written by the generator
+    and raise an error instead of being resolved.
+    """
+    for key in ('$ref', 'dependencies', 'oneOf', 'anyOf'):
+        if key in schema:
+            raise ValueError(f'Can not compute defaults of schema with {key}')
+    defaults = parent_defaults
+    if isinstance(defaults, dict) and isinstance(schema.get('default'), dict):
+        defaults = merge_objects(defaults, schema['default'])
+    elif 'default' in schema:
+        defaults = schema['default']
+    elif isinstance(schema.get('items'), list):
+        defaults = [
+            rjsf_compute_defaults(item, parent_defaults[i] if isinstance(parent_defaults, list) and i < len(parent_defaults) else None)
+            for i, item in enumerate(schema['items'])
+        ]
+    type_ = schema_type(schema)
+    if type_ == 'object':
+        parent = defaults if isinstance(defaults, dict) else {}
+        data = form_data if isinstance(form_data, dict) else {}
+        computed = {}
+        for key, prop in schema.get('properties', {}).items():
+            value = rjsf_compute_defaults(prop, parent.get(key), data.get(key))
+            if value is not None:
+                computed[key] = value
+        return computed
+    if type_ == 'array':
+        items = schema.get('items', {})
+        if isinstance(defaults, list):
+            # schema.items[idx] is undefined in JavaScript when items is a single schema
+            defaults = [
+                rjsf_compute_defaults((items[i] if isinstance(items, list) and i < len(items) else None) or schema.get('additionalItems') or {}, item)
+                for i, item in enumerate(defaults)
+            ]
+        if isinstance(form_data, list):
+            defaults = [
+                rjsf_compute_defaults(items if isinstance(items, dict) else {}, defaults[i] if isinstance(defaults, list) and i < len(defaults) else None, item)
+                for i, item in enumerate(form_data)
+            ]
+        if schema.get('minItems'):
+            if is_multi_select(schema):
+                return defaults if defaults is not None else []
+            current = defaults if defaults is not None else []
+            if schema['minItems'] > len(current):
+                filler = schema.get('additionalItems', {}) if isinstance(items, list) else items
+                return current + [rjsf_compute_defaults(filler) for _ in range(schema['minItems'] - len(current))]
+    return defaults
+
+def rjsf_form_defaults(schema, max_renders=10):
+    """Form data rjsf v4 ends up with when it renders an empty form of schema.
+
+    Each render calls getDefaultFormState with the form data of the previous render,
+    which resolves if/then/else against that form data.
+    Stops when a render no longer changes the form data.
+    """
+    unconditional = {k: v for k, v in schema.items() if k not in {'if', 'then', 'else'}}
+    form_data = None
+    for _ in range(max_renders):
+        resolved = unconditional
+        if 'if' in schema:
+            branch = schema['then'] if condition_holds(schema['if'], form_data or {}) else schema['else']
+            resolved = merge_schemas(unconditional, branch)
+        defaults = rjsf_compute_defaults(resolved, schema.get('default'), form_data)
+        # First render has no form data yet, so gets the defaults as is
+        rendered = defaults if form_data is None else merge_defaults_with_form_data(defaults, form_data)
+        if rendered == form_data:
+            return form_data
+        form_data = rendered
+    raise ValueError(f'Form data did not settle after {max_renders} renders')
+
+def check_defaults(catalog):
+    """Raise error when defaults of global or a node differ from the form data rjsf derives from its schema.
+
+    The placeholders rjsf pads arrays with are left out of the defaults, so also from the form data.
+    """
+    for label, item in [('global', catalog['global'])] + [(f'node {node["id"]}', node) for node in catalog['nodes']]:
+        expected = without_placeholders(rjsf_form_defaults(item['schema']))
+        if item['defaults'] != expected:
+            keys = sorted(k for k in expected.keys() | item['defaults'].keys() if expected.get(k) != item['defaults'].get(k))
+            raise ValueError(f'Defaults of {label} differ from rjsf for {", ".join(keys)}')
+
+def load_jsonschema():
+    try:
+        import jsonschema
+    except ImportError as e:
+        raise ImportError('Checking catalogs requires the jsonschema package, install it with `pip install jsonschema`') from e
+    return jsonschema
+
+def check_ui_schema(ui_schema, schema, path, problems):
+    """Append problem for each uiSchema key which is not a ui: option or a property or items of schema"""
+    for key, value in ui_schema.items():
+        if key.startswith('ui:'):
+            continue
+        if schema_type(schema) == 'array' and key == 'items' and isinstance(schema.get('items'), dict):
+            check_ui_schema(value, schema['items'], f'{path}.items', problems)
+        elif schema_type(schema) == 'object' and key in schema_properties(schema):
+            check_ui_schema(value, schema_properties(schema)[key], f'{path}.{key}', problems)
+        else:
+            problems.append(f'uiSchema{path}.{key} has no matching schema')
+
+def check_toml_schema(toml_schema, schema, path, problems):
+    """Append problem for each tomlSchema key which has no property in schema or does not fit its type"""
+    properties = schema_properties(schema)
+    for key, prop_toml in toml_schema.items():
+        if key not in properties:
+            problems.append(f'tomlSchema{path}.{key} has no matching schema')
+            continue
+        check_toml_property(prop_toml, properties[key], f'{path}.{key}', problems)
+
+def check_toml_property(prop_toml, schema, path, problems):
+    for key, value in prop_toml.items():
+        if key in {'indexed', 'flatten', 'sectioned'}:
+            if not isinstance(value, bool):
+                problems.append(f'tomlSchema{path}.{key} must be a boolean')
+        elif key == 'items':
+            if schema_type(schema) == 'array' and isinstance(schema.get('items'), dict):
+                check_toml_property(value, schema['items'], f'{path}.items', problems)
+            else:
+                problems.append(f'tomlSchema{path}.items is set, but schema is not an array')
+        elif key == 'properties':
+            if schema_type(schema) == 'object':
+                check_toml_schema(value, schema, f'{path}.properties', problems)
+            else:
+                problems.append(f'tomlSchema{path}.properties is set, but schema is not an object')
+        else:
+            problems.append(f'tomlSchema{path}.{key} is unknown')
+
+def check_custom_keywords(schema, global_arrays, path, problems):
+    """Append problem for each maxItemsFrom or maxPropertiesFrom which does not fit its schema or global parameter"""
+    for keyword, type_ in (('maxItemsFrom', 'array'), ('maxPropertiesFrom', 'object')):
+        if keyword not in schema:
+            continue
+        if schema_type(schema) != type_:
+            problems.append(f'schema{path} has {keyword}, but is not an {type_}')
+        if schema[keyword] not in global_arrays:
+            problems.append(f'schema{path}.{keyword} refers to {schema[keyword]}, which is not an array of global')
+    if 'if' in schema:
+        for key in schema['if'].get('properties', {}):
+            if key not in schema.get('properties', {}):
+                problems.append(f'schema{path}.if refers to {key}, which is not a property')
+    if isinstance(schema.get('properties'), dict):
+        for key, prop in schema['properties'].items():
+            check_custom_keywords(prop, global_arrays, f'{path}.properties.{key}', problems)
+    for keyword in ('items', 'additionalProperties', 'propertyNames', 'if', 'then', 'else'):
+        if isinstance(schema.get(keyword), dict):
+            check_custom_keywords(schema[keyword], global_arrays, f'{path}.{keyword}', problems)
+
+def has_placeholder(value):
+    """Whether value has a null item, which rjsf puts in arrays for items which have no default"""
+    if isinstance(value, list):
+        return any(v is None or has_placeholder(v) for v in value)
+    if isinstance(value, dict):
+        return any(has_placeholder(v) for v in value.values())
+    return False
+
+def check_catalog_item(item, global_arrays):
+    """Problems of global or a node of a catalog as list of strings.
+
+    The schema is validated against the draft 7 meta schema,
+    the uiSchema and tomlSchema keys are checked against the schema properties
+    and the defaults are validated against the schema.
+    Defaults are incomplete by nature, so missing required parameters
+    and parameters with empty array items that the user still has to fill are not a problem.
+    """
+    jsonschema = load_jsonschema()
+    validator_class = jsonschema.Draft7Validator
+    problems = []
+    schema = item['schema']
+    meta_errors = list(validator_class(validator_class.META_SCHEMA).iter_errors(schema))
+    for error in meta_errors:
+        problems.append(f'schema{error.json_path[1:]} is invalid: {error.message}')
+    check_ui_schema(item.get('uiSchema', {}), schema, '', problems)
+    check_toml_schema(item.get('tomlSchema', {}), schema, '', problems)
+    check_custom_keywords(schema, global_arrays, '', problems)
+    if 'defaults' in item and not meta_errors:
+        filled = {k: v for k, v in item['defaults'].items() if not has_placeholder(v)}
+        for error in validator_class(schema).iter_errors(filled):
+            if error.validator != 'required':
+                problems.append(f'defaults{error.json_path[1:]} is invalid: {error.message}')
+    return problems
+
+def check_catalogs(catalogs, jobs=1):
+    """Raise error listing the problems found by check_catalog_item in global and nodes of catalogs of each level.
+
+    A node which is the same on multiple levels is checked once.
+    With jobs > 1 the checks run in a process pool.
+    """
+    load_jsonschema()
+    tasks = {}
+    for level, catalog in catalogs.items():
+        # maxItemsFrom and maxPropertiesFrom can refer to array parameters of global
+        global_arrays = sorted(k for k, v in schema_properties(catalog['global']['schema']).items() if schema_type(v) == 'array')
+        items = [('global', catalog['global'])] + [(f'node {node["id"]}', node) for node in catalog['nodes']]
+        for label, item in items:
+            key = canonical_json([item, global_arrays])
+            if key not in tasks:
+                tasks[key] = (label, item, global_arrays, [])
+            tasks[key][3].append(level)
+    tasks = list(tasks.values())
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            results = list(executor.map(check_catalog_item, [t[1] for t in tasks], [t[2] for t in tasks], chunksize=8))
+    else:
+        results = [check_catalog_item(item, global_arrays) for _, item, global_arrays, _ in tasks]
+    problems = [
+        f'{label} on {", ".join(levels)} level: {problem}'
+        for (label, _, _, levels), item_problems in zip(tasks, results)
+        for problem in item_problems
+    ]
+    if problems:
+        raise ValueError('Catalogs have problems:\n' + '\n'.join(problems))
+    logging.warning(f'Checked {len(tasks)} schemas of {len(catalogs)} levels')
+
+def map_subschemas(schema, fn):
+    """Copy of JSON schema with fn applied to each of its direct sub schemas"""
+    new_schema = dict(schema)
+    if isinstance(schema.get('properties'), dict):
+        new_schema['properties'] = {k: fn(v) for k, v in schema['properties'].items()}
+    for keyword in ('items', 'additionalProperties', 'propertyNames', 'if', 'then', 'else'):
+        if isinstance(schema.get(keyword), dict):
+            new_schema[keyword] = fn(schema[keyword])
+    return new_schema
+
+def canonical_json(data):
+    return json.dumps(data, sort_keys=True, separators=(',', ':'))
+
+def catalog_schemas(catalog):
+    return [catalog['global']['schema']] + [node['schema'] for node in catalog['nodes']]
+
+def replace_catalog_schemas(catalog, fn):
+    """Copy of catalog with fn applied to global and node schemas, leaving the given catalog untouched"""
+    new_catalog = dict(catalog)
+    new_catalog['global'] = {**catalog['global'], 'schema': fn(catalog['global']['schema'])}
+    new_catalog['nodes'] = [{**node, 'schema': fn(node['schema'])} for node in catalog['nodes']]
+    return new_catalog
+
+def dedup_catalog(catalog, min_size=64):
+    """Move sub schemas which occur more than once in the catalog to $defs of catalog and refer to them with $ref.
+
+    Only sub schemas whose JSON is at least min_size long are moved.
+    Ajv and rjsf resolve a $ref against the schema it is in, not the catalog,
+    so the builder inlines the refs (inlineRefs in packages/core/src/catalog.ts) when it loads the catalog.
+    """
+    counts = {}
+    def count(schema):
+        key = canonical_json(schema)
+        counts[key] = counts.get(key, 0) + 1
+        map_subschemas(schema, count)
+        return schema
+    for schema in catalog_schemas(catalog):
+        map_subschemas(schema, count)
+
+    defs = {}
+    def lift(schema):
+        key = canonical_json(schema)
+        if counts[key] > 1 and len(key) >= min_size:
+            name = sha256(key.encode())[:12]
+            defs[name] = schema
+            return {'$ref': f'#/$defs/{name}'}
+        return map_subschemas(schema, lift)
+    deduped = replace_catalog_schemas(catalog, lambda schema: map_subschemas(schema, lift))
+    deduped['$defs'] = dict(sorted(defs.items()))
+    return deduped
+
+def expand_refs(catalog):
+    """Inverse of dedup_catalog"""
+    defs = catalog.get('$defs', {})
+    prefix = '#/$defs/'
+    def expand(schema):
+        if list(schema) == ['$ref'] and schema['$ref'].startswith(prefix):
+            return expand(defs[schema['$ref'][len(prefix):]])
+        return map_subschemas(schema, expand)
+    expanded = replace_catalog_schemas(catalog, expand)
+    expanded.pop('$defs', None)
+    return expanded
+
+def dedup_level(catalog, level):
+    """Deduplicate schemas of catalog, log the size reduction and check refs expand to original schemas"""
+    deduped = dedup_catalog(catalog)
+    if expand_refs(deduped) != catalog:
+        raise ValueError(f'Expanding $refs of deduplicated {level} catalog does not give original catalog')
+    before = len(canonical_json(catalog))
+    after = len(canonical_json(deduped))
+    nr_refs = canonical_json(deduped).count('"$ref":"#/$defs/')
+    logging.warning(f'Deduplicated {level} catalog: {len(deduped["$defs"])} $defs used by {nr_refs} $refs, {before} -> {after} bytes of JSON ({after / before:.0%})')
+    return deduped
+
+def ordered_json(data):
+    # Unlike canonical_json, the key order matters as it is kept in written catalog
+    return json.dumps(data, separators=(',', ':'))
+
+def union_keys(versions):
+    """Keys of all versions, where each key is placed after its predecessor in the version it came from.
+
+    Versions are ordered from lowest to highest level, keys of highest level come first.
+    """
+    keys = []
+    for version in reversed(versions):
+        previous = None
+        for key in version:
+            if key not in keys:
+                keys.insert(keys.index(previous) + 1 if previous is not None else 0, key)
+            previous = key
+    return keys
+
+def list_key(item):
+    if isinstance(item, dict):
+        for key in ('id', 'name'):
+            if isinstance(item.get(key), str):
+                return (key, item[key])
+    return None
+
+def merge_levels(versions):
+    """Merge the values of multiple levels into one value annotated with explevels.
+
+    versions is a dict with level as key and value of that level, ordered from lowest to highest level.
+    A dict (or list of dicts with id or name) which is only present from a certain level gets
+    an explevel key with that level. Values that can not be merged are stored per level in {'x-levels': {level: value}}.
+    """
+    values = list(versions.values())
+    first = ordered_json(values[0])
+    if all(ordered_json(v) == first for v in values[1:]):
+        return values[0]
+    if all(isinstance(v, dict) for v in values):
+        keyed = [{(None, k): v2 for k, v2 in v.items()} for v in values]
+    elif all(isinstance(v, list) and v and all(list_key(i) for i in v) for v in values):
+        keyed = [{list_key(i): i for i in v} for v in values]
+    else:
+        return {'x-levels': versions}
+    if any(len(k) != len(v) for k, v in zip(keyed, values)):
+        # Duplicate ids
+        return {'x-levels': versions}
+    keys = union_keys(keyed)
+    if any([k for k in keys if k in v] != list(v) for v in keyed):
+        # Order of keys can not be reconstructed from union
+        return {'x-levels': versions}
+    levels = list(versions)
+    merged = []
+    for key in keys:
+        present = {level: v[key] for level, v in zip(levels, keyed) if key in v}
+        child = merge_levels(present)
+        if len(present) == len(levels):
+            merged.append((key, child))
+        elif list(present) == levels[-len(present):] and isinstance(child, dict) and 'explevel' not in child and 'x-levels' not in child:
+            # Present from a level and all higher levels
+            merged.append((key, {'explevel': levels[-len(present)], **child}))
+        else:
+            merged.append((key, {'x-levels': present}))
+    if isinstance(values[0], dict):
+        return {k: v for (_, k), v in merged}
+    return [v for _, v in merged]
+
+def project_level(master, level, levels=None):
+    """Catalog of a level from a catalog written by master_catalog"""
+    if levels is None:
+        levels = master['levels']
+    rank = levels.index
+    def visible(value):
+        if isinstance(value, dict) and list(value) == ['x-levels']:
+            return level in value['x-levels']
+        if isinstance(value, dict) and 'explevel' in value:
+            return rank(level) >= rank(value['explevel'])
+        return True
+    def project(value):
+        if isinstance(value, dict) and list(value) == ['x-levels']:
+            return value['x-levels'][level]
+        if isinstance(value, dict):
+            return {k: project(v) for k, v in value.items() if k != 'explevel' and visible(v)}
+        if isinstance(value, list):
+            return [project(v) for v in value if visible(v)]
+        return value
+    if 'levels' not in master:
+        return project(master)
+    return project({k: v for k, v in master.items() if k != 'levels'})
+
+def master_catalog(catalogs):
+    """Merge catalogs of all levels into single catalog annotated with explevels.
+
+    Raises error when projecting the master does not give the catalog of each level.
+    """
+    levels = list(catalogs)
+    master = {'levels': levels, **merge_levels(catalogs)}
+    for level, catalog in catalogs.items():
+        if ordered_json(project_level(master, level)) != ordered_json(catalog):
+            raise ValueError(f'Projecting master catalog on {level} level does not give {level} catalog')
+    return master
+
+def json_pointer(path, key):
+    return f'{path}/' + str(key).replace('~', '~0').replace('/', '~1')
+
+def diff_list(old, new, path, ops):
+    old_keys = [list_key(item) for item in old]
+    new_keys = [list_key(item) for item in new]
+    keyed = all(old_keys) and all(new_keys) and len(set(old_keys)) == len(old_keys) and len(set(new_keys)) == len(new_keys)
+    if not keyed:
+        if len(old) == len(new):
+            for index, (old_item, new_item) in enumerate(zip(old, new)):
+                diff_json(old_item, new_item, json_pointer(path, index), ops)
+        elif ordered_json(old) != ordered_json(new):
+            ops.append({'op': 'replace', 'path': path, 'value': new})
+        return
+    new_set = set(new_keys)
+    old_set = set(old_keys)
+    if [k for k in old_keys if k in new_set] != [k for k in new_keys if k in old_set]:
+        # Reordered, JSON Patch has no cheap way to express it
+        ops.append({'op': 'replace', 'path': path, 'value': new})
+        return
+    for index in reversed(range(len(old))):
+        if old_keys[index] not in new_set:
+            ops.append({'op': 'remove', 'path': json_pointer(path, index)})
+    old_items = dict(zip(old_keys, old))
+    # After removals and previous additions, the old item of a key is at the index of the new item
+    for index, (key, item) in enumerate(zip(new_keys, new)):
+        if key not in old_items:
+            ops.append({'op': 'add', 'path': json_pointer(path, index), 'value': item})
+        elif ordered_json(old_items[key]) != ordered_json(item):
+            diff_json(old_items[key], item, json_pointer(path, index), ops)
+
+def diff_json(old, new, path='', ops=None):
+    """JSON Patch (RFC 6902) operations which turn old into new.
+
+    Lists of dicts with an id or name (like nodes and categories) are matched by that key,
+    so only changed nodes are descended into.
+    Dicts whose key order can not be kept with add operations are replaced.
+    """
+    if ops is None:
+        ops = []
+    if isinstance(old, dict) and isinstance(new, dict):
+        kept = [k for k in old if k in new]
+        if kept + [k for k in new if k not in old] != list(new):
+            ops.append({'op': 'replace', 'path': path, 'value': new})
+            return ops
+        for key in old:
+            if key not in new:
+                ops.append({'op': 'remove', 'path': json_pointer(path, key)})
+        for key in kept:
+            diff_json(old[key], new[key], json_pointer(path, key), ops)
+        for key, value in new.items():
+            if key not in old:
+                ops.append({'op': 'add', 'path': json_pointer(path, key), 'value': value})
+    elif isinstance(old, list) and isinstance(new, list):
+        diff_list(old, new, path, ops)
+    elif ordered_json(old) != ordered_json(new):
+        ops.append({'op': 'replace', 'path': path, 'value': new})
+    return ops
+
+def apply_patch(doc, ops):
+    """Copy of doc with JSON Patch add, remove and replace operations applied"""
+    doc = json.loads(json.dumps(doc))
+    for op in ops:
+        parts = [p.replace('~1', '/').replace('~0', '~') for p in op['path'].split('/')[1:]]
+        if not parts:
+            doc = op['value']
+            continue
+        target = doc
+        for part in parts[:-1]:
+            target = target[int(part)] if isinstance(target, list) else target[part]
+        last = parts[-1]
+        if isinstance(target, list):
+            last = len(target) if last == '-' else int(last)
+        if op['op'] == 'add' and isinstance(target, list):
+            target.insert(last, op['value'])
+        elif op['op'] in {'add', 'replace'}:
+            target[last] = op['value']
+        elif op['op'] == 'remove':
+            del target[last]
+        else:
+            raise ValueError(f'Unsupported JSON Patch operation {op["op"]}')
+    return doc
+
+def describe_schema_changes(label, old, new):
+    old_props = old.get('properties', {}) | old.get('else', {}).get('properties', {})
+    new_props = new.get('properties', {}) | new.get('else', {}).get('properties', {})
+    lines = []
+    added = [k for k in new_props if k not in old_props]
+    removed = [k for k in old_props if k not in new_props]
+    if added:
+        lines.append(f'{label}: added parameters {", ".join(added)}')
+    if removed:
+        lines.append(f'{label}: removed parameters {", ".join(removed)}')
+    for key, prop in new_props.items():
+        if key in old_props and ordered_json(old_props[key]) != ordered_json(prop):
+            keywords = [k for k in union_keys([old_props[key], prop]) if ordered_json(old_props[key].get(k)) != ordered_json(prop.get(k))]
+            lines.append(f'{label}: changed {key} ({", ".join(keywords)})')
+    return lines
+
+def summarize_changes(old, new):
+    """Human readable lines describing the differences between two catalogs"""
+    lines = []
+    old_nodes = {n['id']: n for n in old.get('nodes', []) if 'id' in n}
+    new_nodes = {n['id']: n for n in new.get('nodes', []) if 'id' in n}
+    lines.extend(f'Added node {id}' for id in new_nodes if id not in old_nodes)
+    lines.extend(f'Removed node {id}' for id in old_nodes if id not in new_nodes)
+    for id, node in new_nodes.items():
+        if id in old_nodes and ordered_json(old_nodes[id]) != ordered_json(node):
+            lines.extend(describe_schema_changes(f'Node {id}', old_nodes[id].get('schema', {}), node.get('schema', {})))
+            lines.extend(
+                f'Node {id}: changed {key}' for key in union_keys([old_nodes[id], node])
+                if key != 'schema' and ordered_json(old_nodes[id].get(key)) != ordered_json(node.get(key))
+            )
+    old_global = old.get('global', {})
+    new_global = new.get('global', {})
+    if isinstance(old_global, dict) and isinstance(new_global, dict):
+        lines.extend(describe_schema_changes('Global', old_global.get('schema', {}), new_global.get('schema', {})))
+    lines.extend(
+        f'Changed {key}' for key in union_keys([old, new])
+        if key not in {'nodes', 'global'} and ordered_json(old.get(key)) != ordered_json(new.get(key))
+    )
+    return lines
+
+def read_catalog_file(file: Path):
+    with file.open() as f:
+        if file.suffix == '.json':
+            return json.load(f)
+        return load(f, Loader=Loader)
+
+def write_patches(written, patch_from: Path, out_dir: Path, root_url: Path):
+    """Write JSON Patches from catalogs in patch_from dir to written catalogs.
+
+    The version chain is written to versions.json, it has for each catalog file the current version
+    and the patches to go from previous versions to the next version,
+    the chain of patch_from/versions.json is continued.
+    A version is the sha256 of the bytes of the catalog file, like the output in the manifest,
+    so a client can compare it with the ETag of serve_haddock3_catalog.py or the hash in a --hashed_names file name.
+    """
+    previous_fn = patch_from / 'versions.json'
+    previous = json.loads(previous_fn.read_text()) if previous_fn.exists() else {}
+    patches_dir = out_dir / 'patches'
+    patches_dir.mkdir(exist_ok=True)
+    versions = {}
+    for name, catalog in written.items():
+        version = sha256((out_dir / name).read_bytes())
+        patches = previous.get(name, {}).get('patches', [])
+        for patch in patches:
+            # Keep older patches of chain available
+            patch_fn = patches_dir / Path(patch['url']).name
+            if not patch_fn.exists() and (patch_from / 'patches' / patch_fn.name).exists():
+                shutil.copy(patch_from / 'patches' / patch_fn.name, patch_fn)
+        old_fn = patch_from / name
+        if old_fn.exists():
+            old_bytes = old_fn.read_bytes()
+            old = read_catalog_file(old_fn)
+            old_version = sha256(old_bytes)
+            if old_version != version:
+                ops = diff_json(old, catalog)
+                if ordered_json(apply_patch(old, ops)) != ordered_json(catalog):
+                    raise ValueError(f'Patch of {name} does not give new catalog')
+                patch_fn = patches_dir / f'{Path(name).stem}.{old_version[:16]}.{version[:16]}.json'
+                with replace_atomically(patch_fn) as f:
+                    json.dump(ops, f, separators=(',', ':'))
+                summary = summarize_changes(old, catalog)
+                logging.warning(f'Written {patch_fn} with {len(ops)} operations, {len(ordered_json(ops))} bytes instead of {len(ordered_json(catalog))}')
+                for line in summary:
+                    logging.warning(f'  {line}')
+                patches = [p for p in patches if p['from'] != old_version] + [{
+                    'from': old_version,
+                    'to': version,
+                    'url': str(root_url / 'patches' / patch_fn.name),
+                    'summary': summary,
+                }]
+        versions[name] = {
+            'version': version,
+            'patches': patches,
+        }
+    with replace_atomically(out_dir / 'versions.json') as f:
+        json.dump(versions, f, indent=2)
+    logging.warning(f'Written {out_dir / "versions.json"}')
+
+@contextmanager
+def replace_atomically(file: Path, mode='w'):
+    """Open temporary file which replaces file once it is completely written.
+
+    So a dev server or browser never reads a half written file.
+    """
+    tmp_fn = file.with_name(f'.{file.name}.tmp')
+    try:
+        with tmp_fn.open(mode) as f:
+            yield f
+        os.replace(tmp_fn, file)
+    finally:
+        tmp_fn.unlink(missing_ok=True)
+
+def write_catalog(catalog, level_fn: Path):
+    """Write catalog in format of the file extension"""
+    with replace_atomically(level_fn) as f:
+        if level_fn.suffix == '.json':
+            dump_json_catalog(catalog, f)
+        else:
+            dump_catalog(catalog, f)
+
+def write_compressed(level_fn: Path, compress, force=False):
+    """Write compressed copies of level file next to it, for static hosts to serve directly"""
+    data = None
+    for name in compress:
+        suffix, compressor = compressions[name]
+        compressed_fn = level_fn.with_name(level_fn.name + suffix)
+        if force or not compressed_fn.exists():
+            data = level_fn.read_bytes() if data is None else data
+            with replace_atomically(compressed_fn, 'wb') as f:
+                f.write(compressor(data))
+            logging.warning(f'Written {compressed_fn}')
+
+def write_level(catalog, level_fn: Path, manifest, compress=()):
+    """Write catalog of a level unless the catalog and file are the same as recorded in the manifest.
+
+    Returns the manifest entry for the level.
+    """
+    entry = {
+        'catalog': sha256(json.dumps(catalog).encode()),
+    }
+    cached = manifest['levels'].get(level_fn.name)
+    if cached and cached['catalog'] == entry['catalog'] and level_fn.exists() and sha256(level_fn.read_bytes()) == cached['output']:
+        logging.warning(f'Skipped {level_fn}, it is unchanged')
+        write_compressed(level_fn, compress)
+        return cached
+    start = perf_counter()
+    with stats.level(level_fn.name):
+        write_catalog(catalog, level_fn)
+    output = level_fn.read_bytes()
+    stats.levels[level_fn.name] = {'seconds': perf_counter() - start, 'bytes': len(output)}
+    entry['output'] = sha256(output)
+    logging.warning(f'Written {level_fn}')
+    write_compressed(level_fn, compress, force=True)
+    return entry
+
+def shard_level(catalog, nodes_url, format):
+    """Split catalog into a skeleton and node details which can be fetched on demand.
+
+    Returns the skeleton and a dict of file names with node details.
+    Each file name contains a hash of its content, so the file can be cached forever
+    and a node which is the same on multiple levels is stored once.
+    """
+    skeleton_keys = {'id', 'label', 'category'}
+    shards = {}
+    skeleton_nodes = []
+    for node in catalog['nodes']:
+        details = {k: v for k, v in node.items() if k not in skeleton_keys}
+        name = f"{node['id']}.{sha256(json.dumps(details).encode())[:16]}.{format}"
+        shards[name] = details
+        skeleton_node = {k: v for k, v in node.items() if k in skeleton_keys}
+        skeleton_node['schemaUrl'] = str(nodes_url / name)
+        skeleton_nodes.append(skeleton_node)
+    skeleton = {k: skeleton_nodes if k == 'nodes' else v for k, v in catalog.items()}
+    return skeleton, shards
+
+search_fields = ('title', 'description', '$comment')
+search_stopwords = frozenset({
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'if', 'in', 'is', 'it',
+    'of', 'on', 'or', 'that', 'the', 'this', 'to', 'which', 'will', 'with',
+})
+
+def search_tokens(text):
+    """Lower case words and numbers of text, without stop words and single characters"""
+    return {token for token in re.findall(r'[a-z0-9]+', text.lower()) if len(token) > 1 and token not in search_stopwords}
+
+def searchable_properties(schema, path=()):
+    """Yield path and schema of each property of schema, including the properties in
+    if/then/else branches and the properties of (nested) array items like the mol parameters"""
+    for key, prop in schema_properties(schema).items():
+        prop_path = path + (key,)
+        yield prop_path, prop
+        items = prop
+        while items.get('type') == 'array' and isinstance(items.get('items'), dict):
+            items = items['items']
+        if 'properties' in items:
+            yield from searchable_properties(items, prop_path)
+
+def search_index(catalog):
+    """Inverted index from words in name, title, description and $comment of parameters to where they are.
+
+    Returns `{'refs': [[node id, path], ...], 'tokens': {token: [index in refs, ...]}}`
+    with tokens sorted, so the builder can also look up prefixes.
+    Parameters of global have `global` as node id.
+    Path is the property names joined by dots, array items are skipped,
+    so `mol.prot_segid` is the prot_segid parameter of each molecule.
+    """
+    refs = []
+    tokens = {}
+    schemas = [('global', catalog['global']['schema'])] + [(node['id'], node['schema']) for node in catalog['nodes']]
+    for node_id, schema in schemas:
+        for path, prop in searchable_properties(schema):
+            key = path[-1]
+            texts = [key, key.replace('_', ' ')] + [prop[field] for field in search_fields if isinstance(prop.get(field), str)]
+            ref = len(refs)
+            refs.append([node_id, '.'.join(path)])
+            for token in search_tokens(' '.join(texts)) | {key.lower()}:
+                tokens.setdefault(token, []).append(ref)
+    return {
+        'refs': refs,
+        'tokens': dict(sorted(tokens.items())),
+    }
+
+def write_hashed_copy(level_fn: Path, digest, compress=()):
+    """Copy level file (and its compressed copies) to name with content hash, which can be cached forever.
+
+    Returns the path of the copy.
+    """
+    stem, format = level_fn.name.rsplit('.', 1)
+    hashed_fn = level_fn.with_name(f'{stem}.{digest[:16]}.{format}')
+    for suffix in [''] + [compressions[name][0] for name in compress]:
+        copy_fn = hashed_fn.with_name(hashed_fn.name + suffix)
+        if not copy_fn.exists():
+            with replace_atomically(copy_fn, 'wb') as f:
+                f.write(level_fn.with_name(level_fn.name + suffix).read_bytes())
+            logging.warning(f'Written {copy_fn}')
+    return hashed_fn
+
+def remove_stale_hashed(out_dir: Path, hashed_fns):
+    """Remove hashed level files of previous runs which are no longer referenced"""
+    names = {fn.name for fn in hashed_fns}
+    names |= {name + suffix for name in names for suffix, _ in compressions.values()}
+    for fn in out_dir.iterdir():
+        if re.fullmatch(r'haddock3(\.\w+)?\.[0-9a-f]{16}\.(yaml|json)(\.gz|\.br)?', fn.name) and fn.name not in names:
+            fn.unlink()
+            logging.warning(f'Removed {fn}')
+
+def hashed_examples(examples, out_dir: Path, root_url: Path):
+    """Examples with URLs of copies that have content hash in name and the paths of those copies.
+
+    The example files are looked up relative to the parent of out_dir,
+    like /examples/some.zip in public/examples/some.zip when out_dir is public/catalog.
+    Examples which can not be found are kept as is.
+    """
+    hashed = {}
+    copies = set()
+    for name, url in examples.items():
+        url_path = Path(url)
+        try:
+            example_fn = out_dir.parent / url_path.relative_to(root_url.parent)
+        except ValueError:
+            example_fn = None
+        if example_fn is None or not example_fn.exists():
+            logging.warning(f'Example {url} not found in {out_dir.parent}, not hashing its name')
+            hashed[name] = url
+            continue
+        digest = sha256(example_fn.read_bytes())
+        hashed_name = f'{example_fn.stem}.{digest[:16]}{example_fn.suffix}'
+        hashed_fn = example_fn.with_name(hashed_name)
+        if not hashed_fn.exists():
+            shutil.copyfile(example_fn, hashed_fn)
+            logging.warning(f'Written {hashed_fn}')
+        hashed[name] = str(url_path.with_name(hashed_name))
+        copies.add(hashed_fn)
+    return hashed, copies
+
+def remove_stale_examples(out_dir: Path, copies, previous_copies):
+    """Remove hashed copies of examples of previous runs which are no longer referenced.
+
+    Stale are the copies in previous_copies, as recorded in the manifest relative to the parent of out_dir,
+    and the copies of the current examples with another hash, like an example whose content changed.
+    """
+    candidates = {out_dir.parent / fn for fn in previous_copies}
+    for copy_fn in copies:
+        stem, suffix = re.fullmatch(r'(.+)\.[0-9a-f]{16}(\.[^.]+)?', copy_fn.name).groups()
+        other_hash = rf'{re.escape(stem)}\.[0-9a-f]{{16}}{re.escape(suffix or "")}'
+        candidates.update(fn for fn in copy_fn.parent.iterdir() if re.fullmatch(other_hash, fn.name))
+    for fn in sorted(candidates - copies):
+        if fn.exists():
+            fn.unlink()
+            logging.warning(f'Removed {fn}')
+
+def write_shards(shards, nodes_dir, compress=()):
+    """Write node details which are not already written, as their name contains hash of content"""
+    nodes_dir.mkdir(exist_ok=True)
+    for name, details in shards.items():
+        node_fn = nodes_dir / name
+        if not node_fn.exists():
+            write_catalog(details, node_fn)
+            write_compressed(node_fn, compress, force=True)
+        else:
+            write_compressed(node_fn, compress)
+
+def remove_stale_shards(nodes_dir, shards):
+    """Remove node files of previous runs which are no longer referenced"""
+    if not nodes_dir.exists():
+        return
+    names = set(shards)
+    names |= {name + suffix for name in shards for suffix, _ in compressions.values()}
+    for node_fn in nodes_dir.iterdir():
+        if node_fn.name not in names:
+            node_fn.unlink()
+            logging.warning(f'Removed {node_fn}')
+
+def write_manifest(sources, levels, file, examples=()):
+    """Write the hashes of the inputs and the nodes they produced, so a next run can skip unchanged modules
+
+    Input paths are relative to the haddock package dir, so the manifest does not contain paths of the build machine.
+    examples are the paths of hashed example copies, so a next run can remove them when they are no longer referenced.
+    """
+    modules = sources['modules']
+    inputs = sources['global']['inputs'].copy()
+    for module in modules:
+        inputs.update(module['inputs'])
+    inputs = {os.path.relpath(fn, sources['package_dir']): digest for fn, digest in inputs.items()}
+    manifest = {
+        'generator': generator_version(),
+        'inputs': inputs,
+        'levels': levels,
+        'examples': sorted(examples),
+        'global': {
+            'digest': sources['global']['digest'],
+            'levels': sources['global']['nodes'],
+        },
+        'nodes': {
+            module['id']: {
+                'digest': module['digest'],
+                'levels': module['nodes'],
+            } for module in modules
+        },
+    }
+    file.parent.mkdir(parents=True, exist_ok=True)
+    with replace_atomically(file) as f:
+        json.dump(manifest, f)
+    logging.warning(f'Written {file}')
+    return manifest
 
 def write_catalog_index(catalogs, file):
-    with file.open('w') as f:
+    with replace_atomically(file) as f:
         json.dump(catalogs, f)
         logging.warning(f'Written {file}')
 
 def main(argv=sys.argv[1:]):
     argparser = argparser_builder()
     args = argparser.parse_args(argv)
+    if args.master and args.shard:
+        argparser.error('--master can not be combined with --shard')
+    if args.dedup and args.shard:
+        # $defs would only be in the skeleton, so the $refs in the node files could not be resolved
+        argparser.error('--dedup can not be combined with --shard')
     args.out_dir.mkdir(parents=True, exist_ok=True)
+    if args.stats_json:
+        tracemalloc.start()
+    start = perf_counter()
+    profiler = cProfile.Profile() if args.profile else None
+    if profiler:
+        profiler.enable()
+    try:
+        build(args)
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+            logging.warning(f'Written {args.profile}')
+    if args.stats_json:
+        stats.write(args.stats_json, perf_counter() - start)
 
+def build(args):
+    """Generate the catalogs as configured by the command line arguments"""
+    manifest = empty_manifest() if args.rebuild else read_manifest(args.manifest)
+    # Single pass, all levels are derived from same loaded sources
+    located = locate_haddock3_static() if args.static else locate_haddock3()
+    sources = load_sources(located, manifest)
+    process_nodes(sources['modules'], sources['levels'], args.jobs)
+    if args.check:
+        with stats.stage('check'):
+            check_catalogs({level: process_level(sources, level) for level in sources['levels']}, args.jobs)
+    manifest = write_catalogs(sources, args, manifest)
+    if args.watch:
+        watch(located, sources, args, manifest)
+
+def write_catalogs(sources, args, manifest):
+    """Write level files, index and manifest of processed sources.
+
+    Returns the written manifest.
+    """
     catalogs = []
-    for level in config_expert_levels:
-        level_fn = args.out_dir / f'haddock3.{level}.yaml'
-        level_url = args.root_url / f'haddock3.{level}.yaml'
+    levels = {}
+    shards = {}
+    level_catalogs = {}
+    written = {}
+    hashed_fns = []
+    example_copies = set()
+    for level in sources['levels']:
+        # Format is in extension of URL, js-yaml in the builder can parse YAML and JSON
+        level_url = args.root_url / f'haddock3.{level}.{args.format[0]}'
+        if args.master:
+            # Builder projects master catalog on level in fragment of URL
+            level_url = f'{args.root_url / f"haddock3.{args.format[0]}"}#{level}'
         catalogs.append([f'haddock3{level}', str(level_url)])
-        process_level(level_fn, level)
-        logging.warning(f'Written {level_fn}')
+        catalog = process_level(sources, level)
+        if args.check_defaults:
+            check_defaults(catalog)
+        if args.search_index:
+            search_fn = args.out_dir / f'haddock3.{level}.search.json'
+            levels[search_fn.name] = write_level(search_index(catalog), search_fn, manifest, args.compress)
+        if args.hashed_names:
+            catalog['examples'], copies = hashed_examples(catalog['examples'], args.out_dir, args.root_url)
+            example_copies |= copies
+        if args.dedup:
+            catalog = dedup_level(catalog, level)
+        if args.check_yaml:
+            check_dumpers(catalog)
+        if args.master:
+            level_catalogs[level] = catalog
+            continue
+        for format in args.format:
+            level_fn = args.out_dir / f'haddock3.{level}.{format}'
+            if args.shard:
+                skeleton, level_shards = shard_level(catalog, args.root_url / 'nodes', format)
+                write_shards(level_shards, args.out_dir / 'nodes', args.compress)
+                shards.update(level_shards)
+                levels[level_fn.name] = write_level(skeleton, level_fn, manifest, args.compress)
+                written[level_fn.name] = skeleton
+            else:
+                levels[level_fn.name] = write_level(catalog, level_fn, manifest, args.compress)
+                written[level_fn.name] = catalog
+            if args.hashed_names:
+                hashed_fns.append(write_hashed_copy(level_fn, levels[level_fn.name]['output'], args.compress))
+        if args.hashed_names:
+            # First format is the one in the index
+            catalogs[-1][1] = str(args.root_url / hashed_fns[-len(args.format)].name)
 
+    if args.master:
+        master = master_catalog(level_catalogs)
+        for format in args.format:
+            master_fn = args.out_dir / f'haddock3.{format}'
+            levels[master_fn.name] = write_level(master, master_fn, manifest, args.compress)
+            written[master_fn.name] = master
+            if args.hashed_names:
+                hashed_fns.append(write_hashed_copy(master_fn, levels[master_fn.name]['output'], args.compress))
+        if args.hashed_names:
+            master_url = args.root_url / hashed_fns[0].name
+            for entry in catalogs:
+                entry[1] = f'{master_url}#{entry[1].split("#")[1]}'
+    if args.patch_from:
+        write_patches(written, args.patch_from, args.out_dir, args.root_url)
+    remove_stale_shards(args.out_dir / 'nodes', shards)
+    if args.hashed_names:
+        remove_stale_hashed(args.out_dir, hashed_fns)
+        remove_stale_examples(args.out_dir, example_copies, manifest.get('examples', []))
     write_catalog_index(catalogs, args.out_dir / 'index.json')
+    examples = [fn.relative_to(args.out_dir.parent).as_posix() for fn in example_copies]
+    return write_manifest(sources, levels, args.manifest, examples)
+
+def input_mtimes(located):
+    files = [module['config_file'] for module in located['modules']] + located['global_files']
+    mtimes = {}
+    for file in files:
+        try:
+            mtimes[Path(file)] = Path(file).stat().st_mtime_ns
+        except FileNotFoundError:
+            # Editors can remove file before writing new version
+            mtimes[Path(file)] = None
+    return mtimes
+
+def reload_changed(sources, located, changed, manifest):
+    """Load and process the modules and global parameters of which a file changed.
+
+    The sources are only updated when everything could be processed,
+    so a bad edit leaves the previous nodes in place.
+    Files with same content as in the manifest are not processed again.
+    """
+    levels = sources['levels']
+    config_files = {module['id']: Path(module['config_file']) for module in located['modules']}
+    reloaded = {
+        i: load_module(located_module, levels, manifest)
+        for i, module in enumerate(sources['modules'])
+        for located_module in located['modules']
+        if located_module['id'] == module['id'] and config_files[module['id']] in changed
+    }
+    process_nodes(list(reloaded.values()), levels)
+    global_ = sources['global']
+    if changed & {Path(file) for file in located['global_files']}:
+        global_ = load_global(located['global_files'], levels, manifest)
+        for level, valid_levels in levels.items():
+            if level not in global_['nodes']:
+                global_['nodes'][level] = process_global(global_['config'], valid_levels)
+    for i, module in reloaded.items():
+        sources['modules'][i] = module
+    sources['global'] = global_
+
+def watch(located, sources, args, manifest):
+    """Regenerate catalogs when a defaults.yaml of a module or global parameters changes, until interrupted"""
+    mtimes = input_mtimes(located)
+    logging.warning(f'Watching {len(mtimes)} files for changes, press Ctrl+C to stop')
+    try:
+        while True:
+            sleep(args.poll_interval)
+            current = input_mtimes(located)
+            changed = {file for file, mtime in current.items() if mtimes[file] != mtime}
+            if not changed:
+                continue
+            mtimes = current
+            start = perf_counter()
+            try:
+                reload_changed(sources, located, changed, manifest)
+                manifest = write_catalogs(sources, args, manifest)
+            except Exception:
+                logging.exception('Failed to regenerate catalogs, keeping previous files')
+                continue
+            logging.warning(f'Regenerated catalogs in {perf_counter() - start:.2f}s')
+    except KeyboardInterrupt:
+        logging.warning('Stopped watching')
 
 
 if __name__ == '__main__':
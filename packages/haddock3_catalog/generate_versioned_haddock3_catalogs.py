@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""Generate catalogs for several haddock3 versions installed in different Python environments.
+
+Each environment is given as a Python interpreter or a virtualenv directory.
+The generate_haddock3_catalog.py script is run with each interpreter in its own subprocess,
+the subprocesses run concurrently and write to <out_dir>/<haddock3 version>/.
+Each version keeps its own manifest in <manifest_dir>/<haddock3 version>/manifest.json,
+so a repeat build of a version whose defaults.yaml files did not change converts nothing.
+Afterwards <out_dir>/index.json is written with the catalogs of every version and level.
+
+Arguments after `--` are passed to generate_haddock3_catalog.py, for example `-- --format json --compress gzip`.
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import json
+import logging
+from pathlib import Path
+import subprocess
+import sys
+
+from generate_haddock3_catalog import write_catalog_index
+
+generator_script = Path(__file__).parent / 'generate_haddock3_catalog.py'
+version_snippet = "import importlib.metadata; print(importlib.metadata.version('haddock3'))"
+
+
+def argparser_builder():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('environments', nargs='+', type=Path, help='Python interpreters or virtualenv directories with haddock3 installed')
+    parser.add_argument('--out_dir', type=Path, default='public/catalog')
+    parser.add_argument('--root_url', type=Path, default='/catalog')
+    parser.add_argument('--manifest_dir', type=Path, default='.cache', help='Dir to keep manifest of each version in, outside of out_dir as it is not needed by the builder')
+    parser.add_argument('--jobs', type=int, help='Number of concurrent builds, default is one per environment')
+    return parser
+
+
+def interpreter_of(environment: Path):
+    """Python interpreter of a virtualenv directory or the interpreter itself"""
+    if environment.is_dir():
+        for candidate in (environment / 'bin' / 'python', environment / 'Scripts' / 'python.exe'):
+            if candidate.exists():
+                return candidate
+        raise ValueError(f'No Python interpreter found in {environment}')
+    return environment
+
+
+def haddock3_version_of(interpreter: Path):
+    result = subprocess.run([str(interpreter), '-c', version_snippet], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise ValueError(f'haddock3 is not installed for {interpreter}: {result.stderr.strip()}')
+    return result.stdout.strip()
+
+
+def build_version(interpreter: Path, version, out_dir: Path, root_url: Path, manifest_dir: Path, generator_args):
+    """Run generator with interpreter into a dir of the version, returns the completed process"""
+    command = [
+        str(interpreter), str(generator_script),
+        '--out_dir', str(out_dir / version),
+        '--root_url', str(root_url / version),
+        '--manifest', str(manifest_dir / version / 'manifest.json'),
+        *generator_args,
+    ]
+    logging.warning(f'Building catalogs of haddock3 {version} with {interpreter}')
+    return subprocess.run(command, capture_output=True, text=True)
+
+
+def merge_indexes(versions, out_dir: Path):
+    """Catalogs of each version and level, titles get the version appended"""
+    catalogs = []
+    for version in versions:
+        with (out_dir / version / 'index.json').open() as f:
+            for title, url in json.load(f):
+                catalogs.append([f'{title} ({version})', url])
+    return catalogs
+
+
+def build(environments, out_dir: Path, root_url: Path, generator_args, jobs=None, manifest_dir=Path('.cache')):
+    """Build catalogs of each environment concurrently and write merged index.
+
+    Returns the versions whose build failed, the merged index is only written when all builds succeeded.
+    """
+    interpreters = [interpreter_of(environment) for environment in environments]
+    with ThreadPoolExecutor(max_workers=jobs or len(interpreters)) as executor:
+        versions = list(executor.map(haddock3_version_of, interpreters))
+        duplicates = {version for version in versions if versions.count(version) > 1}
+        if duplicates:
+            raise ValueError(f'Multiple environments have haddock3 {", ".join(sorted(duplicates))}')
+        out_dir.mkdir(parents=True, exist_ok=True)
+        futures = [
+            executor.submit(build_version, interpreter, version, out_dir, root_url, manifest_dir, generator_args)
+            for interpreter, version in zip(interpreters, versions)
+        ]
+        failed = []
+        for interpreter, version, future in zip(interpreters, versions, futures):
+            result = future.result()
+            if result.returncode != 0:
+                logging.error(f'Failed to build catalogs of haddock3 {version} with {interpreter}:\n{result.stderr}')
+                failed.append(version)
+            else:
+                logging.warning(f'Built catalogs of haddock3 {version} in {out_dir / version}')
+    if failed:
+        logging.error(f'Not writing {out_dir / "index.json"} as builds failed')
+        return failed
+    write_catalog_index(merge_indexes(versions, out_dir), out_dir / 'index.json')
+    return failed
+
+
+def main(argv=sys.argv[1:]):
+    generator_args = []
+    if '--' in argv:
+        separator = argv.index('--')
+        argv, generator_args = argv[:separator], argv[separator + 1:]
+    args = argparser_builder().parse_args(argv)
+    failed = build(args.environments, args.out_dir, args.root_url, generator_args, args.jobs, args.manifest_dir)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
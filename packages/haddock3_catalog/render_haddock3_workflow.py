@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""Render workflows with nested catalog parameters to haddock3 workflow files with flat parameter names.
+
+Reverse of the conversion done by validate_haddock3_workflow.py and of collapse_expandable in the generator,
+for example `{'rair': [[{'sta': 1}]]}` is written as `rair_sta_1_1 = 1`.
+The names are built from templates computed once per node from the tomlSchema in the catalog.
+
+Reads JSON lines with workflows like `{"global": {...}, "nodes": [{"type": "topoaa", "parameters": {...}}]}`,
+an optional "name" key is used as file name, and writes a workflow.cfg file for each.
+A name with a path separator is rejected, so files are only written in the output dir.
+"""
+import argparse
+from collections import Counter
+import json
+import math
+from pathlib import Path
+import re
+import sys
+
+from generate_haddock3_catalog import read_catalog_file
+from validate_haddock3_workflow import toml_layout
+
+bare_key = re.compile(r'[A-Za-z0-9_-]+')
+
+
+def argparser_builder():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--catalog', type=Path, default='public/catalog/haddock3.guru.yaml', help='Catalog of a level in YAML or JSON format')
+    parser.add_argument('--out_dir', type=Path, default='workflows', help='Directory to write <name>.cfg files to')
+    parser.add_argument('workflows', nargs='+', help='JSON lines files with workflows, use - to read from stdin')
+    return parser
+
+
+def toml_key(key):
+    return key if bare_key.fullmatch(key) else json.dumps(key)
+
+
+def toml_value(value):
+    """Value as inline TOML, None items of arrays are left out like in the workflow builder"""
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, float):
+        if math.isnan(value):
+            return 'nan'
+        if math.isinf(value):
+            return 'inf' if value > 0 else '-inf'
+        return repr(value)
+    if isinstance(value, str):
+        if "'" not in value and value.isprintable():
+            return f"'{value}'"
+        return json.dumps(value)
+    if isinstance(value, list):
+        return '[' + ', '.join(toml_value(v) for v in value if v is not None) + ']'
+    if isinstance(value, dict):
+        if not value:
+            return '{}'
+        return '{ ' + ', '.join(f'{toml_key(k)} = {toml_value(v)}' for k, v in value.items() if v is not None) + ' }'
+    raise TypeError(f'Can not write {value!r} as TOML')
+
+
+def flattener(layout):
+    """Function which converts nested parameters of catalog to flat haddock3 names.
+
+    The function returns list of (name, value) pairs and
+    list of sub tables as (name, pairs, sub tables, is array of tables) tuples.
+    Each parameter of the layout gets a name template and an emitter once,
+    so rendering a workflow is only formatting names.
+    """
+    emitters = {}
+    for name, (kind, sub) in layout.items():
+        if kind == 'scalar_array':
+            template = name + '_{}'
+
+            def emit(value, pairs, tables, template=template):
+                pairs.extend((template.format(i), v) for i, v in enumerate(value, 1) if v is not None)
+        elif kind == 'scalar_array2':
+            template = name + '_{}_{}'
+
+            def emit(value, pairs, tables, template=template):
+                pairs.extend(
+                    (template.format(i, j), v)
+                    for i, row in enumerate(value, 1) if row is not None
+                    for j, v in enumerate(row, 1) if v is not None
+                )
+        elif kind == 'object':
+            template = name + '_{}'
+
+            def emit(value, pairs, tables, template=template):
+                pairs.extend((template.format(k), v) for k, v in value.items() if v is not None)
+        elif kind == 'flatten':
+            template = name + '_{}_{}'
+
+            def emit(value, pairs, tables, template=template):
+                pairs.extend(
+                    (template.format(k, i), v)
+                    for i, item in enumerate(value, 1) if item is not None
+                    for k, v in item.items() if v is not None
+                )
+        elif kind == 'flatten2':
+            template = name + '_{}_{}_{}'
+
+            def emit(value, pairs, tables, template=template):
+                pairs.extend(
+                    (template.format(k, i, j), v)
+                    for i, row in enumerate(value, 1) if row is not None
+                    for j, item in enumerate(row, 1) if item is not None
+                    for k, v in item.items() if v is not None
+                )
+        elif kind == 'sectioned':
+            template = name + '{}'
+
+            def emit(value, pairs, tables, template=template, nested=flattener(sub)):
+                tables.extend(
+                    (template.format(i), *nested(item), False)
+                    for i, item in enumerate(value, 1) if item is not None
+                )
+        elif kind == 'table_array':
+            def emit(value, pairs, tables, name=name, nested=flattener(sub)):
+                tables.extend((name, *nested(item), True) for item in value if item is not None)
+        elif kind == 'table':
+            def emit(value, pairs, tables, name=name):
+                tables.append((name, [(k, v) for k, v in value.items() if v is not None], [], False))
+        else:
+            raise ValueError(f'Unknown layout {kind} of {name}')
+        emitters[name] = emit
+
+    def flatten(parameters):
+        pairs = []
+        tables = []
+        for key, value in parameters.items():
+            if value is None:
+                continue
+            emit = emitters.get(key)
+            if emit is None or not isinstance(value, (list, dict)):
+                pairs.append((key, value))
+            else:
+                emit(value, pairs, tables)
+        return pairs, tables
+
+    return flatten
+
+
+def write_table(header, pairs, tables, lines, is_array=False):
+    if header is not None:
+        lines.append(f'[[{header}]]' if is_array else f'[{header}]')
+    lines.extend(f'{toml_key(k)} = {toml_value(v)}' for k, v in pairs)
+    lines.append('')
+    for name, sub_pairs, sub_tables, sub_is_array in tables:
+        sub_header = toml_key(name) if header is None else f'{header}.{toml_key(name)}'
+        write_table(sub_header, sub_pairs, sub_tables, lines, sub_is_array)
+
+
+class WorkflowRenderer:
+    """Renders workflows with nested parameters to haddock3 workflow text"""
+    def __init__(self, catalog):
+        global_ = catalog['global']
+        self.global_flattener = flattener(toml_layout(global_['schema'], global_.get('tomlSchema', {})))
+        self.node_flatteners = {
+            node['id']: flattener(toml_layout(node['schema'], node.get('tomlSchema', {})))
+            for node in catalog['nodes']
+        }
+        self.plain = flattener({})
+
+    def render(self, workflow):
+        lines = []
+        write_table(None, *self.global_flattener(workflow.get('global', {})), lines)
+        occurrences = Counter(node['type'] for node in workflow['nodes'])
+        track = Counter()
+        for node in workflow['nodes']:
+            node_type = node['type']
+            track[node_type] += 1
+            # Like the workflow builder, repeated nodes get an index
+            section = f"'{node_type}.{track[node_type]}'" if occurrences[node_type] > 1 else toml_key(node_type)
+            flatten = self.node_flatteners.get(node_type, self.plain)
+            write_table(section, *flatten(node['parameters']), lines)
+        return '\n'.join(lines)
+
+
+def json_lines(lines):
+    for line in lines:
+        if line.strip():
+            yield json.loads(line)
+
+
+def read_workflows(names):
+    for name in names:
+        if name == '-':
+            yield from json_lines(sys.stdin)
+        else:
+            with open(name) as lines:
+                yield from json_lines(lines)
+
+
+def workflow_file(out_dir: Path, name):
+    """Path of <name>.cfg in out_dir, names which would write outside of out_dir are rejected"""
+    if not isinstance(name, str) or not name or name in {'.', '..'} or '/' in name or '\\' in name:
+        raise ValueError(f'Workflow name {name!r} can not be used as file name')
+    return out_dir / f'{name}.cfg'
+
+
+def main(argv=sys.argv[1:]):
+    args = argparser_builder().parse_args(argv)
+    renderer = WorkflowRenderer(read_catalog_file(args.catalog))
+    args.out_dir.mkdir(parents=True, exist_ok=True)
+    for index, workflow in enumerate(read_workflows(args.workflows), 1):
+        name = workflow.get('name', f'workflow{index}')
+        workflow_file(args.out_dir, name).write_text(renderer.render(workflow))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""Serve haddock3 catalogs generated on demand from the installed haddock3.
+
+Serves /catalog/index.json and /catalog/haddock3.<level>.<yaml|json>.
+Catalogs are generated in a subprocess, as haddock3 modules imported by the server would stay in memory.
+Generated catalogs are kept in a LRU cache keyed by a fingerprint of the haddock3 package,
+the version and the modification time and size of its .py and .yaml files,
+so a new haddock3 install or a change in a source checkout is picked up without restarting the server.
+Walking the package for the fingerprint is done at most once per --fingerprint_ttl seconds,
+so a change is picked up by requests made that long after it.
+Responses have an ETag and requests with a matching If-None-Match get a 304 Not Modified.
+"""
+import argparse
+from functools import lru_cache
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import importlib
+import importlib.util
+import json
+import logging
+import os
+from pathlib import Path
+import re
+import subprocess
+import sys
+import threading
+import time
+
+from generate_haddock3_catalog import haddock3_version, sha256
+
+here = Path(__file__).resolve().parent
+# Run by subprocess in dir of this script, prints levels as JSON when level is empty or the catalog of level
+generate_snippet = """
+import json, logging, sys
+from generate_haddock3_catalog import build_catalog, dumps_catalog, locate_haddock3, locate_haddock3_static
+logging.disable(logging.WARNING)
+level, format, static = sys.argv[1:]
+if level:
+    sys.stdout.write(dumps_catalog(build_catalog(level, static=bool(static)), format))
+else:
+    located = locate_haddock3_static() if static else locate_haddock3()
+    json.dump(list(located['levels']), sys.stdout)
+"""
+
+content_types = {
+    'json': 'application/json',
+    'yaml': 'application/yaml',
+}
+
+
+def argparser_builder():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bind', default='127.0.0.1', help='Address to listen on')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--root_url', default='/catalog', help='Path under which catalogs are served')
+    parser.add_argument('--format', choices=content_types, default='yaml', help='Format of catalogs listed in index.json')
+    parser.add_argument('--static', action='store_true', help='Read haddock3 package from disk instead of importing it')
+    parser.add_argument('--cache_size', type=int, default=16, help='Number of generated catalogs to keep in memory')
+    parser.add_argument('--fingerprint_ttl', type=float, default=5,
+                        help='Seconds to reuse fingerprint of haddock3 package before walking the package again')
+    return parser
+
+
+def haddock3_fingerprint():
+    """Hash of haddock3 version and modification time and size of the .py and .yaml files of the haddock package"""
+    # Forget directory listings of sys.path, so a new install is found
+    importlib.invalidate_caches()
+    spec = importlib.util.find_spec('haddock')
+    if spec is None or not spec.submodule_search_locations:
+        raise ModuleNotFoundError('Unable to find haddock3 package')
+    package_dir = spec.submodule_search_locations[0]
+    files = []
+    for dir, _, names in os.walk(package_dir):
+        for name in names:
+            if name.endswith(('.py', '.yaml')):
+                stat = os.stat(os.path.join(dir, name))
+                files.append((os.path.join(dir, name), stat.st_mtime_ns, stat.st_size))
+    return sha256(json.dumps([haddock3_version(), package_dir, sorted(files)]).encode())
+
+
+def generate(level, format, static):
+    """Output of generate_snippet run in a subprocess with the same Python interpreter"""
+    result = subprocess.run(
+        [sys.executable, '-c', generate_snippet, level or '', format, '1' if static else ''],
+        capture_output=True, cwd=here,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f'Generating catalog failed:\n{result.stderr.decode()}')
+    return result.stdout
+
+
+class CatalogService:
+    """Generates catalogs and index on demand and caches them by fingerprint of haddock3 package"""
+    def __init__(self, root_url='/catalog', format='yaml', static=False, cache_size=16, fingerprint_ttl=5):
+        self.root_url = root_url.rstrip('/')
+        self.format = format
+        self.static = static
+        self.levels = lru_cache(maxsize=4)(self._levels)
+        self.body = lru_cache(maxsize=cache_size)(self._body)
+        self.fingerprint_ttl = fingerprint_ttl
+        self.fingerprint_lock = threading.Lock()
+        self.current_fingerprint = None
+        self.fingerprint_expires = 0
+
+    def fingerprint(self):
+        """Fingerprint of haddock3 package, computed at most once per fingerprint_ttl seconds"""
+        # Concurrent requests wait for a single walk of the package
+        with self.fingerprint_lock:
+            now = time.monotonic()
+            if self.current_fingerprint is None or now >= self.fingerprint_expires:
+                self.current_fingerprint = haddock3_fingerprint()
+                self.fingerprint_expires = now + self.fingerprint_ttl
+            return self.current_fingerprint
+
+    def _levels(self, fingerprint):
+        return json.loads(generate(None, 'json', self.static))
+
+    def _body(self, fingerprint, level, format):
+        """Serialized catalog of level and its ETag"""
+        if level is None:
+            catalogs = [[f'haddock3{level}', f'{self.root_url}/haddock3.{level}.{self.format}'] for level in self.levels(fingerprint)]
+            body = json.dumps(catalogs).encode()
+        else:
+            body = generate(level, format, self.static)
+        return body, f'"{sha256(body)}"'
+
+    def get(self, path):
+        """Returns body, ETag and content type for path or None when path is not a catalog"""
+        fingerprint = self.fingerprint()
+        if path == f'{self.root_url}/index.json':
+            return *self.body(fingerprint, None, 'json'), content_types['json']
+        match = re.fullmatch(rf'{re.escape(self.root_url)}/haddock3\.(\w+)\.(yaml|json)', path)
+        if match is None or match.group(1) not in self.levels(fingerprint):
+            return None
+        level, format = match.groups()
+        return *self.body(fingerprint, level, format), content_types[format]
+
+
+def etag_matches(if_none_match, etag):
+    if if_none_match is None:
+        return False
+    tags = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+    return '*' in tags or etag in tags
+
+
+def handler_builder(service):
+    class CatalogHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.respond()
+
+        def do_HEAD(self):
+            self.respond(with_body=False)
+
+        def respond(self, with_body=True):
+            path = self.path.split('?', 1)[0]
+            try:
+                found = service.get(path)
+            except Exception:
+                logging.exception(f'Failed to generate {path}')
+                self.send_error(HTTPStatus.INTERNAL_SERVER_ERROR)
+                return
+            if found is None:
+                self.send_error(HTTPStatus.NOT_FOUND)
+                return
+            body, etag, content_type = found
+            if etag_matches(self.headers.get('If-None-Match'), etag):
+                self.send_response(HTTPStatus.NOT_MODIFIED)
+                self.send_header('ETag', etag)
+                self.end_headers()
+                return
+            self.send_response(HTTPStatus.OK)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'no-cache')
+            # Builder dev server runs on another port
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            if with_body:
+                self.wfile.write(body)
+
+    return CatalogHandler
+
+
+def main(argv=None):
+    args = argparser_builder().parse_args(argv)
+    service = CatalogService(args.root_url, args.format, args.static, args.cache_size, args.fingerprint_ttl)
+    # Fail early when haddock3 can not be found
+    service.fingerprint()
+    server = ThreadingHTTPServer((args.bind, args.port), handler_builder(service))
+    logging.warning(f'Serving catalogs on http://{args.bind}:{args.port}{service.root_url}/index.json')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Scripts are not a package, make them importable from the tests
+sys.path.insert(0, str(Path(__file__).parent.parent))
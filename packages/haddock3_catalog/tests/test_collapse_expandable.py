@@ -0,0 +1,184 @@
+import pytest
+
+from generate_haddock3_catalog import collapse_expandable, config2schema, expandable_name
+
+
+def param(title, type_='integer', **extra):
+    p = {
+        'title': title,
+        'short': f'Short description of {title}',
+        'long': f'Long description of {title}',
+        'group': 'restraints',
+        'explevel': 'easy',
+        'type': type_,
+        'default': 1,
+    }
+    p.update(extra)
+    return p
+
+
+def without_group(p):
+    return {k: v for k, v in p.items() if k != 'group'}
+
+
+@pytest.mark.parametrize('key,expected', [
+    ('rair_end_20_1', ('rair_end', ['20', '1'])),
+    ('int_20_20', ('int', ['20', '20'])),
+    ('mol_fix_origin_1', ('mol_fix_origin', ['1'])),
+    ('ncs_sta1_1', ('ncs_sta1', ['1'])),
+    ('resdic_', ('resdic_', [])),
+    ('ambig_fname', ('ambig_fname', [])),
+    # Numeric middle token stays in name
+    ('a_2_b_1', ('a_2_b', ['1'])),
+    # At most 2 trailing indices
+    ('x_1_2_3', ('x_1', ['2', '3'])),
+    # Name can not be empty
+    ('1_2', ('1', ['2'])),
+])
+def test_expandable_name(key, expected):
+    assert expandable_name(key) == expected
+
+
+def test_array_of_arrays_of_objects():
+    config = {
+        'rair_sta_1_1': param('Start residue number'),
+        'rair_end_1_1': param('End residue number'),
+        'rair_sta_20_1': param('Start residue number'),
+        'rair_end_20_1': param('End residue number'),
+    }
+
+    collapsed = collapse_expandable(config)
+
+    assert collapsed == {
+        'rair': {
+            'type': 'list',
+            'dim': 2,
+            'properties': {
+                'sta': without_group(config['rair_sta_1_1']),
+                'end': without_group(config['rair_end_1_1']),
+            },
+            'group': 'restraints',
+            'maxItemsFrom': 'molecules',
+            'maxindices': [20, 1],
+        },
+    }
+
+
+def test_array_of_arrays_of_scalars():
+    config = {
+        'int_1_1': param('Interaction', 'float'),
+        'int_20_20': param('Interaction', 'float'),
+    }
+
+    collapsed = collapse_expandable(config)
+
+    assert collapsed == {
+        'int': {
+            'type': 'list',
+            'dim': 2,
+            'items': without_group(config['int_1_1']),
+            'group': 'restraints',
+            'maxindices': [20, 20],
+        },
+    }
+
+
+def test_array_of_scalars_for_molecules():
+    config = {
+        'mol_fix_origin_1': param('Fix origin', 'boolean', default=False),
+        'mol_fix_origin_3': param('Fix origin', 'boolean', default=False),
+    }
+
+    collapsed = collapse_expandable(config)
+
+    assert collapsed == {
+        'mol_fix_origin': {
+            'type': 'list',
+            'dim': 1,
+            'items': without_group(config['mol_fix_origin_1']),
+            'maxItemsFrom': 'molecules',
+            'group': 'restraints',
+            'maxindices': [3],
+        },
+    }
+
+
+def test_array_of_objects():
+    config = {
+        'ncs_sta1_1': param('Start residue number'),
+        'ncs_sta1_4': param('Start residue number'),
+    }
+
+    collapsed = collapse_expandable(config)
+
+    assert collapsed == {
+        'ncs': {
+            'type': 'list',
+            'dim': 1,
+            'properties': {
+                'sta1': without_group(config['ncs_sta1_1']),
+            },
+            'group': 'restraints',
+            'maxindices': [4],
+        },
+    }
+
+
+def test_array_of_objects_with_numeric_middle_token():
+    config = {
+        'a_2_b_1': param('B'),
+    }
+
+    collapsed = collapse_expandable(config)
+
+    assert collapsed == {
+        'a_2': {
+            'type': 'list',
+            'dim': 1,
+            'properties': {
+                'b': without_group(config['a_2_b_1']),
+            },
+            'group': 'restraints',
+        },
+    }
+
+
+def test_not_expandable_is_unchanged():
+    config = {
+        'resdic_': param('Residues', 'list', default=[], minitems=0, maxitems=100),
+        'ambig_fname': param('Ambiguous restraints', 'file', default=''),
+    }
+
+    assert collapse_expandable(config) == config
+
+
+def test_single_index_has_no_maxindices():
+    collapsed = collapse_expandable({'hisd_1': param('Residue number')})
+
+    assert 'maxindices' not in collapsed['hisd']
+
+
+def test_max_items_from_maxindices():
+    config = {
+        'rair_sta_1_1': param('Start residue number'),
+        'rair_sta_20_1': param('Start residue number'),
+        'int_1_1': param('Interaction', 'float'),
+        'int_20_20': param('Interaction', 'float'),
+        'mol_fix_origin_1': param('Fix origin', 'boolean', default=False),
+        'mol_fix_origin_3': param('Fix origin', 'boolean', default=False),
+        'ncs_sta1_1': param('Start residue number'),
+        'ncs_sta1_4': param('Start residue number'),
+        'hisd_1': param('Residue number'),
+    }
+
+    properties = config2schema(collapse_expandable(config))['schema']['properties']
+
+    assert properties['rair']['maxItems'] == 20
+    # Second index of rair is 1, so inner array is unbounded
+    assert 'maxItems' not in properties['rair']['items']
+    assert properties['int']['maxItems'] == 20
+    assert properties['int']['items']['maxItems'] == 20
+    assert properties['mol_fix_origin']['maxItems'] == 3
+    assert properties['mol_fix_origin']['maxItemsFrom'] == 'molecules'
+    assert properties['ncs']['maxItems'] == 4
+    assert 'maxItems' not in properties['hisd']
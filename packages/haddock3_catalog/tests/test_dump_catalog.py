@@ -0,0 +1,41 @@
+from io import StringIO
+import json
+
+import pytest
+
+from generate_haddock3_catalog import Stats, dump_catalog, dump_json_catalog
+import generate_haddock3_catalog
+
+
+@pytest.mark.parametrize('catalog', [
+    {},
+    {'title': 'x', 'nodes': []},
+    {'title': 'x', 'global': {'schema': {'type': 'object'}}, 'nodes': [{'id': 'a'}, {'id': 'b', 'label': 'é'}], 'examples': {}},
+])
+def test_dump_json_catalog_same_as_json_dump(catalog):
+    stream = StringIO()
+
+    dump_json_catalog(catalog, stream)
+
+    assert stream.getvalue() == json.dumps(catalog, separators=(',', ':'))
+
+
+def test_dump_json_catalog_rejects_nan():
+    with pytest.raises(ValueError):
+        dump_json_catalog({'nodes': [{'id': 'a', 'default': float('nan')}]}, StringIO())
+
+
+@pytest.mark.parametrize('dumper,level', [(dump_json_catalog, 'haddock3.easy.json'), (dump_catalog, 'haddock3.easy.yaml')])
+def test_output_bytes_per_node(monkeypatch, dumper, level):
+    stats = Stats()
+    monkeypatch.setattr(generate_haddock3_catalog, 'stats', stats)
+    catalog = {'title': 'x', 'global': {'schema': {}}, 'nodes': [{'id': 'a'}, {'id': 'b', 'label': 'é' * 10}]}
+    stream = StringIO()
+
+    with stats.level(level):
+        dumper(catalog, stream)
+
+    output = {name: entry['output_bytes'][level] for name, entry in stats.modules.items()}
+    assert output['b'] > output['a']
+    # Only the nodes key and closing brackets are not attributed to a module
+    assert 0 <= len(stream.getvalue().encode()) - sum(output.values()) <= len(',"nodes":[]}')
@@ -0,0 +1,37 @@
+from pathlib import Path
+
+from generate_haddock3_catalog import hashed_examples, remove_stale_examples
+
+
+def test_stale_example_copies_removed(tmp_path):
+    out_dir = tmp_path / 'catalog'
+    out_dir.mkdir()
+    examples_dir = tmp_path / 'examples'
+    examples_dir.mkdir()
+    example_fn = examples_dir / 'docking.zip'
+    example_fn.write_text('v1')
+    _, old_copies = hashed_examples({'docking': '/examples/docking.zip'}, out_dir, Path('/catalog'))
+    dropped_fn = examples_dir / 'dropped.0123456789abcdef.zip'
+    dropped_fn.write_text('dropped')
+    unrelated_fn = examples_dir / 'other.0123456789abcdef.zip'
+    unrelated_fn.write_text('other')
+
+    example_fn.write_text('v2')
+    examples, copies = hashed_examples({'docking': '/examples/docking.zip'}, out_dir, Path('/catalog'))
+    remove_stale_examples(out_dir, copies, ['examples/dropped.0123456789abcdef.zip'])
+
+    [copy_fn] = copies
+    assert examples == {'docking': f'/examples/{copy_fn.name}'}
+    assert copy_fn.read_text() == 'v2'
+    assert not any(fn.exists() for fn in old_copies)
+    assert not dropped_fn.exists()
+    # Not a copy of a current example and not recorded as copy, so kept
+    assert unrelated_fn.exists()
+    assert example_fn.exists()
+
+
+def test_example_not_found_kept_as_is(tmp_path):
+    examples, copies = hashed_examples({'docking': '/examples/docking.zip'}, tmp_path / 'catalog', Path('/catalog'))
+
+    assert examples == {'docking': '/examples/docking.zip'}
+    assert copies == set()
@@ -0,0 +1,230 @@
+import json
+
+import pytest
+
+from generate_haddock3_catalog import config2schema
+from render_haddock3_workflow import WorkflowRenderer, flattener, main, read_workflows, workflow_file
+from validate_haddock3_workflow import WorkflowValidator
+
+
+def param(title, type_='integer', **extra):
+    p = {
+        'title': title,
+        'short': f'Short description of {title}',
+        'long': f'Long description of {title}',
+        'group': 'module',
+        'explevel': 'easy',
+        'type': type_,
+        'default': 1,
+    }
+    p.update(extra)
+    return p
+
+
+@pytest.mark.parametrize('layout,parameters,pairs', [
+    (
+        {'hisd': ('scalar_array', None)},
+        {'hisd': [10, None, 30]},
+        [('hisd_1', 10), ('hisd_3', 30)],
+    ),
+    (
+        {'int': ('scalar_array2', None)},
+        {'int': [[1.0, 2.0], None, [3.0]]},
+        [('int_1_1', 1.0), ('int_1_2', 2.0), ('int_3_1', 3.0)],
+    ),
+    (
+        {'resdic': ('object', None)},
+        {'resdic': {'A': [1, 2], 'B': None}},
+        [('resdic_A', [1, 2])],
+    ),
+    (
+        {'ncs': ('flatten', None)},
+        {'ncs': [{'sta1': 1, 'seg1': 'A'}, None, {'sta1': 3}]},
+        [('ncs_sta1_1', 1), ('ncs_seg1_1', 'A'), ('ncs_sta1_3', 3)],
+    ),
+    (
+        {'seg': ('flatten2', None)},
+        {'seg': [[{'sta': 1, 'end': 2}], [None, {'sta': 3}]]},
+        [('seg_sta_1_1', 1), ('seg_end_1_1', 2), ('seg_sta_2_2', 3)],
+    ),
+    (
+        # Not a list or dict, so written as is
+        {'hisd': ('scalar_array', None)},
+        {'hisd': 5, 'other': 'x', 'skipped': None},
+        [('hisd', 5), ('other', 'x')],
+    ),
+])
+def test_flattener_pairs(layout, parameters, pairs):
+    assert flattener(layout)(parameters) == (pairs, [])
+
+
+def test_flattener_sectioned():
+    flatten = flattener({'mol': ('sectioned', {'hisd': ('scalar_array', None)})})
+
+    assert flatten({'mol': [{'prot_segid': 'A', 'hisd': [10]}, None, {'prot_segid': 'C'}]}) == ([], [
+        ('mol1', [('prot_segid', 'A'), ('hisd_1', 10)], [], False),
+        ('mol3', [('prot_segid', 'C')], [], False),
+    ])
+
+
+def test_flattener_table_array():
+    flatten = flattener({'restraints': ('table_array', {'sta': ('scalar_array', None)})})
+
+    assert flatten({'restraints': [{'sta': [1, 2]}, None]}) == ([], [
+        ('restraints', [('sta_1', 1), ('sta_2', 2)], [], True),
+    ])
+
+
+def test_flattener_table():
+    flatten = flattener({'options': ('table', None)})
+
+    assert flatten({'options': {'a': 1, 'b': None}}) == ([], [('options', [('a', 1)], [], False)])
+
+
+def test_flattener_unknown_kind():
+    with pytest.raises(ValueError, match='Unknown layout'):
+        flattener({'x': ('spiral', None)})
+
+
+def node(node_id, config):
+    schemas = config2schema(config)
+    return {'id': node_id, 'schema': schemas['schema'], 'tomlSchema': schemas['tomlSchema']}
+
+
+@pytest.fixture
+def catalog():
+    global_ = config2schema({
+        'molecules': param('Input Molecules', 'list', default=[], minitems=1, maxitems=20, accept=['.pdb']),
+        'mode': param('Mode', 'string', default='local', choices=['local', 'batch']),
+    })
+    topoaa = {
+        'autohis': param('Automatic HIS protonation state', 'boolean', default=True),
+        'mol1': {
+            'title': 'Input molecule configuration',
+            'short': 'Parameters for each input molecule',
+            'long': 'Long text',
+            'group': 'molecule',
+            'explevel': 'easy',
+            'type': 'dict',
+            'prot_segid': param('Segment ID', 'string', default='A', minchars=0, maxchars=4),
+            'hisd_1': param('Residue number'),
+            'hisd_2': param('Residue number'),
+            'seg_sta_1_1': param('Start residue number'),
+            'seg_end_1_1': param('End residue number'),
+        },
+    }
+    emref = {
+        'xpar_1': param('Distance', 'float'),
+        'xpar_2': param('Distance', 'float'),
+        'int_1_1': param('Interaction', 'float'),
+        'int_2_2': param('Interaction', 'float'),
+        'ncs_sta1_1': param('Start residue number'),
+        'ncs_seg1_1': param('Segment ID', 'string', default='A'),
+        'ncs_sta1_2': param('Start residue number'),
+        'ncs_seg1_2': param('Segment ID', 'string', default='A'),
+        'seg_sta_1_1': param('Start residue number'),
+        'seg_end_1_1': param('End residue number'),
+        'resdic_': param('Residues', 'list', default=[], minitems=0, maxitems=100),
+        'tolerance': param('Tolerance'),
+    }
+    return {
+        'global': {'schema': global_['schema'], 'tomlSchema': global_['tomlSchema']},
+        'nodes': [node('topoaa', topoaa), node('emref', emref)],
+    }
+
+
+def test_render_validate_round_trip(catalog):
+    workflow = {
+        'global': {'molecules': ['a.pdb', 'b.pdb'], 'mode': 'local'},
+        'nodes': [
+            {'type': 'topoaa', 'parameters': {
+                'autohis': False,
+                'mol': [
+                    {'prot_segid': 'A', 'hisd': [10, 20]},
+                    {'prot_segid': 'B', 'seg': [[{'sta': 1, 'end': 5}]]},
+                ],
+            }},
+            {'type': 'emref', 'parameters': {
+                'xpar': [1.5, 2.5],
+                'int': [[1.0, 2.0], [3.0, 4.0]],
+                'ncs': [{'sta1': 1, 'seg1': 'A'}, {'sta1': 2, 'seg1': 'B'}],
+                'seg': [[{'sta': 1, 'end': 2}]],
+                'resdic': {'A': [1, 2], 'B': [3]},
+                'tolerance': 5,
+            }},
+            {'type': 'emref', 'parameters': {'tolerance': 10}},
+        ],
+    }
+
+    text = WorkflowRenderer(catalog).render(workflow)
+    validator = WorkflowValidator(catalog)
+
+    assert "[topoaa.mol1]\nprot_segid = 'A'\nhisd_1 = 10\nhisd_2 = 20" in text
+    assert "['emref.2']\ntolerance = 10" in text
+    assert validator.parse(text) == workflow
+    assert validator.validate_text(text) == []
+
+
+def test_round_trip_reports_invalid_value(catalog):
+    workflow = {
+        'global': {'molecules': ['a.pdb'], 'mode': 'cloud'},
+        'nodes': [],
+    }
+
+    errors = WorkflowValidator(catalog).validate_text(WorkflowRenderer(catalog).render(workflow))
+
+    assert [(e['workflowPath'], e['instancePath'], e['keyword']) for e in errors] == [('global', '/mode', 'enum')]
+
+
+@pytest.mark.parametrize('name', ['../x', '../../x', '/tmp/x', 'sub/x', 'sub\\x', '..', '.', '', None])
+def test_workflow_file_rejects_names_outside_out_dir(tmp_path, name):
+    with pytest.raises(ValueError, match='can not be used as file name'):
+        workflow_file(tmp_path, name)
+
+
+def test_workflow_file(tmp_path):
+    assert workflow_file(tmp_path, 'docking..v2') == tmp_path / 'docking..v2.cfg'
+
+
+def test_main_writes_named_and_numbered_workflows(tmp_path, catalog):
+    catalog_fn = tmp_path / 'catalog.json'
+    catalog_fn.write_text(json.dumps(catalog))
+    workflows_fn = tmp_path / 'workflows.jsonl'
+    workflows_fn.write_text(
+        json.dumps({'name': 'docking', 'global': {'mode': 'local'}, 'nodes': []}) + '\n\n'
+        + json.dumps({'global': {'mode': 'batch'}, 'nodes': []}) + '\n'
+    )
+    out_dir = tmp_path / 'out'
+
+    main(['--catalog', str(catalog_fn), '--out_dir', str(out_dir), str(workflows_fn)])
+
+    assert (out_dir / 'docking.cfg').read_text() == "mode = 'local'\n"
+    assert (out_dir / 'workflow2.cfg').read_text() == "mode = 'batch'\n"
+
+
+def test_main_rejects_name_outside_out_dir(tmp_path, catalog):
+    catalog_fn = tmp_path / 'catalog.json'
+    catalog_fn.write_text(json.dumps(catalog))
+    workflows_fn = tmp_path / 'workflows.jsonl'
+    workflows_fn.write_text(json.dumps({'name': '../escaped', 'global': {}, 'nodes': []}) + '\n')
+
+    with pytest.raises(ValueError):
+        main(['--catalog', str(catalog_fn), '--out_dir', str(tmp_path / 'out'), str(workflows_fn)])
+
+    assert not (tmp_path / 'escaped.cfg').exists()
+
+
+def test_read_workflows_closes_file(tmp_path, monkeypatch):
+    workflows_fn = tmp_path / 'workflows.jsonl'
+    workflows_fn.write_text('{"nodes": []}\n')
+    opened = []
+    real_open = open
+
+    def recording_open(*args, **kwargs):
+        f = real_open(*args, **kwargs)
+        opened.append(f)
+        return f
+    monkeypatch.setattr('builtins.open', recording_open)
+
+    assert list(read_workflows([str(workflows_fn)])) == [{'nodes': []}]
+    assert [f.closed for f in opened] == [True]
@@ -0,0 +1,16 @@
+from generate_haddock3_catalog import rjsf_form_defaults, schema_defaults
+
+
+def test_placeholders_left_out():
+    schema = {
+        'type': 'object',
+        'properties': {
+            'molecules': {'type': 'array', 'minItems': 1, 'items': {'type': 'string'}},
+            'hisd': {'type': 'array', 'minItems': 2, 'default': [10], 'items': {'type': 'integer'}},
+            'ncs': {'type': 'array', 'minItems': 1, 'items': {'type': 'object', 'properties': {}}},
+            'mode': {'type': 'string', 'default': 'local'},
+        },
+    }
+
+    assert rjsf_form_defaults(schema) == {'molecules': [None], 'hisd': [10, None], 'ncs': [{}], 'mode': 'local'}
+    assert schema_defaults(schema) == {'hisd': [10], 'ncs': [{}], 'mode': 'local'}
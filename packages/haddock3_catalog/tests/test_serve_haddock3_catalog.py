@@ -0,0 +1,24 @@
+import serve_haddock3_catalog
+from serve_haddock3_catalog import CatalogService
+
+
+def test_fingerprint_reused_within_ttl(monkeypatch):
+    fingerprints = iter(['first', 'second'])
+    monkeypatch.setattr(serve_haddock3_catalog, 'haddock3_fingerprint', lambda: next(fingerprints))
+    now = [100.0]
+    monkeypatch.setattr(serve_haddock3_catalog.time, 'monotonic', lambda: now[0])
+    service = CatalogService(fingerprint_ttl=5)
+
+    assert service.fingerprint() == 'first'
+    now[0] = 104.9
+    assert service.fingerprint() == 'first'
+    now[0] = 105.0
+    assert service.fingerprint() == 'second'
+
+
+def test_fingerprint_every_request_without_ttl(monkeypatch):
+    calls = []
+    monkeypatch.setattr(serve_haddock3_catalog, 'haddock3_fingerprint', lambda: calls.append(1) or len(calls))
+    service = CatalogService(fingerprint_ttl=0)
+
+    assert [service.fingerprint() for _ in range(3)] == [1, 2, 3]
@@ -0,0 +1,233 @@
+from pathlib import Path
+import random
+import sys
+
+import pytest
+
+from generate_haddock3_catalog import config2schema, filter_on_level, schema_defaults
+from validate_haddock3_workflow import SchemaCompiler, WorkflowParseError, WorkflowValidator, split_sections, unflattener
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'benchmarks'))
+from synthetic_haddock import global_configs, module_config, param, topology_config  # noqa: E402
+
+all_levels = {'easy', 'expert', 'guru'}
+
+
+def generated_schemas():
+    """Schemas the generator writes for synthetic haddock3 modules with parameters of each shape"""
+    mandatory, optional, modules_defaults = global_configs()
+    configs = {
+        'global': mandatory | optional | modules_defaults,
+        'topoaa': topology_config(),
+        'module': module_config(random.Random(1), 24),
+    }
+    return {name: config2schema(filter_on_level(config, all_levels))['schema'] for name, config in configs.items()}
+
+
+# Values which are valid or invalid for various parameters
+candidate_values = [
+    None, True, False, 0, 1, -100000, 100000, 1.5, '', 'a', 'rdie', 'batch', 'x' * 200,
+    [], [1], [1.5, 2.5], [1, 1], ['a.pdb'], [[1]], [{'sta1': 1}], [{'sta1': 'x'}], [{'unknown': 1}],
+    [1] * 50, {}, {'A': [1, 2]}, {'A': [1, 1]}, {'AA': [1]}, {'A': 'x'},
+]
+
+
+def instances(schema):
+    """Defaults of schema with each property in turn replaced by each candidate value, and with an unknown property"""
+    defaults = schema_defaults(schema)
+    yield defaults
+    yield {**defaults, 'unknown': 1}
+    names = list(schema['properties']) + [k for branch in ('then', 'else') for k in schema.get(branch, {}).get('properties', {})]
+    for name in names:
+        for value in candidate_values:
+            yield {**defaults, name: value}
+
+
+@pytest.mark.parametrize('name,schema', list(generated_schemas().items()))
+def test_schema_compiler_agrees_with_jsonschema(name, schema):
+    jsonschema = pytest.importorskip('jsonschema')
+    reference = jsonschema.Draft7Validator(schema)
+    validate = SchemaCompiler(schema).compile(schema)
+    nr_invalid = 0
+    for data in instances(schema):
+        errors = []
+        # No global parameters as context, so maxItemsFrom is not checked like jsonschema does
+        validate(data, (), {}, errors)
+        expected = reference.is_valid(data)
+        assert (not errors) == expected, f'{name} {data}: {errors}'
+        nr_invalid += not expected
+    # Candidates should give invalid data, otherwise the comparison is not worth much
+    assert nr_invalid > 0
+
+
+def test_schema_compiler_error_paths():
+    schema = generated_schemas()['topoaa']
+    errors = []
+
+    SchemaCompiler(schema).compile(schema)({'mol': [{'prot_segid': 'TOOLONG'}]}, (), {}, errors)
+
+    assert [(e['instancePath'], e['keyword']) for e in errors] == [('/mol/0/prot_segid', 'maxLength')]
+
+
+def test_schema_compiler_max_items_from_context():
+    schema = generated_schemas()['module']
+    errors = []
+
+    SchemaCompiler(schema).compile(schema)({'mol_shape': [True, False]}, (), {'molecules': ['a.pdb']}, errors)
+
+    assert [(e['instancePath'], e['keyword']) for e in errors] == [('/mol_shape', 'maxItemsFrom')]
+
+
+def test_schema_compiler_follows_refs():
+    schema = {
+        'type': 'object',
+        'properties': {'a': {'$ref': '#/$defs/residue'}},
+        '$defs': {'residue': {'type': 'number', 'minimum': 1}},
+    }
+    errors = []
+
+    SchemaCompiler(schema).compile(schema)({'a': 0}, (), {}, errors)
+
+    assert [(e['instancePath'], e['keyword']) for e in errors] == [('/a', 'minimum')]
+
+
+def test_schema_compiler_rejects_unsupported_keyword():
+    with pytest.raises(ValueError, match='Unsupported JSON schema keyword oneOf'):
+        SchemaCompiler({}).compile({'oneOf': [{'type': 'number'}]})
+
+
+layout = {
+    'hisd': ('scalar_array', None),
+    'int': ('scalar_array2', None),
+    'resdic': ('object', None),
+    'ncs': ('flatten', None),
+    'seg': ('flatten2', None),
+    'mol': ('sectioned', {'hisd': ('scalar_array', None)}),
+    'restraints': ('table_array', {'sta': ('scalar_array', None)}),
+}
+
+
+def test_unflattener():
+    unflatten = unflattener(layout)
+
+    assert unflatten({
+        'hisd_1': 10,
+        'hisd_3': 30,
+        'int_1_2': 1.5,
+        'resdic_A': [1, 2],
+        'ncs_sta1_2': 1,
+        'ncs_seg1_2': 'A',
+        'seg_sta_1_2': 3,
+        'mol2': {'prot_segid': 'B', 'hisd_1': 5},
+        'restraints': [{'sta_1': 1}],
+        'tolerance': 5,
+    }) == {
+        'hisd': [10, None, 30],
+        'int': [[None, 1.5]],
+        'resdic': {'A': [1, 2]},
+        'ncs': [None, {'sta1': 1, 'seg1': 'A'}],
+        'seg': [[None, {'sta': 3}]],
+        'mol': [None, {'prot_segid': 'B', 'hisd': [5]}],
+        'restraints': [{'sta': [1]}],
+        'tolerance': 5,
+    }
+
+
+@pytest.mark.parametrize('key', ['hisd_0', 'hisd_x', 'hisd_1_1', 'int_1', 'ncs_1', 'seg_sta_1', 'mol0', 'hisdx_1'])
+def test_unflattener_keeps_names_not_fitting_layout(key):
+    assert unflattener(layout)({key: 1}) == {key: 1}
+
+
+def test_unflattener_longest_name_first():
+    unflatten = unflattener({'seg': ('scalar_array', None), 'seg_sta': ('scalar_array', None)})
+
+    assert unflatten({'seg_sta_1': 1, 'seg_1': 2}) == {'seg_sta': [1], 'seg': [2]}
+
+
+def test_split_sections():
+    text = '\n'.join([
+        "molecules = ['a.pdb']",
+        '[topoaa]',
+        'autohis = false',
+        '[topoaa.mol1]',
+        "prot_segid = 'A'",
+        '[emref]',
+        'tolerance = 5',
+    ])
+
+    assert split_sections(text) == [
+        (None, {'molecules': ['a.pdb']}),
+        ('topoaa', {'autohis': False, 'mol1': {'prot_segid': 'A'}}),
+        ('emref', {'tolerance': 5}),
+    ]
+
+
+def test_split_sections_repeated_node():
+    text = '\n'.join([
+        'ncores = 4',
+        '[emref]',
+        'tolerance = 5',
+        '[emref.mol1]',
+        'hisd_1 = 1',
+        '[emref]',
+        'tolerance = 10',
+    ])
+
+    assert split_sections(text) == [
+        (None, {'ncores': 4}),
+        ('emref', {'tolerance': 5, 'mol1': {'hisd_1': 1}}),
+        ('emref', {'tolerance': 10}),
+    ]
+
+
+def test_split_sections_numbered_node():
+    text = '\n'.join([
+        "['emref.1']",
+        'tolerance = 5',
+        "['emref.2']",
+        'tolerance = 10',
+    ])
+
+    assert split_sections(text) == [
+        (None, {}),
+        ('emref', {'tolerance': 5}),
+        ('emref', {'tolerance': 10}),
+    ]
+
+
+def test_split_sections_invalid_toml():
+    with pytest.raises(WorkflowParseError, match='Invalid TOML'):
+        split_sections('[emref]\ntolerance = ')
+
+
+def test_parse_node_named_like_global_parameter():
+    global_ = config2schema({
+        'mode': param('Mode', 'string', default='local', choices=['local', 'batch']),
+    })
+    node = config2schema({'tolerance': param('Tolerance', 'integer', default=1)})
+    catalog = {
+        'global': {'schema': global_['schema'], 'tomlSchema': global_['tomlSchema']},
+        'nodes': [{'id': 'mode_refine', 'schema': node['schema'], 'tomlSchema': node['tomlSchema']}],
+    }
+
+    workflow = WorkflowValidator(catalog).parse("mode = 'batch'\n[mode_refine]\ntolerance = 5\n")
+
+    assert workflow == {
+        'global': {'mode': 'batch'},
+        'nodes': [{'type': 'mode_refine', 'parameters': {'tolerance': 5}}],
+    }
+
+
+def test_parse_sectioned_global_parameter():
+    global_ = config2schema({'mol1': topology_config()['mol1']})
+    catalog = {
+        'global': {'schema': global_['schema'], 'tomlSchema': global_['tomlSchema']},
+        'nodes': [],
+    }
+
+    workflow = WorkflowValidator(catalog).parse("[mol1]\nprot_segid = 'A'\nhisd_1 = 3\n[mol2]\nprot_segid = 'B'\n")
+
+    assert workflow == {
+        'global': {'mol': [{'prot_segid': 'A', 'hisd': [3]}, {'prot_segid': 'B'}]},
+        'nodes': [],
+    }
@@ -0,0 +1,29 @@
+import hashlib
+import json
+from pathlib import Path
+
+from generate_haddock3_catalog import write_patches
+
+
+def test_versions_are_hashes_of_written_files(tmp_path):
+    old_dir = tmp_path / 'old'
+    old_dir.mkdir()
+    out_dir = tmp_path / 'new'
+    out_dir.mkdir()
+    old = {'title': 'old', 'nodes': []}
+    new = {'title': 'new', 'nodes': []}
+    (old_dir / 'haddock3.easy.json').write_text(json.dumps(old))
+    (out_dir / 'haddock3.easy.json').write_text(json.dumps(new, separators=(',', ':')))
+
+    write_patches({'haddock3.easy.json': new}, old_dir, out_dir, Path('/catalog'))
+
+    versions = json.loads((out_dir / 'versions.json').read_text())
+    old_version = hashlib.sha256((old_dir / 'haddock3.easy.json').read_bytes()).hexdigest()
+    new_version = hashlib.sha256((out_dir / 'haddock3.easy.json').read_bytes()).hexdigest()
+    [patch] = versions['haddock3.easy.json']['patches']
+    assert versions['haddock3.easy.json']['version'] == new_version
+    assert (patch['from'], patch['to']) == (old_version, new_version)
+    assert patch['url'] == f'/catalog/patches/haddock3.easy.{old_version[:16]}.{new_version[:16]}.json'
+    assert json.loads((out_dir / 'patches' / Path(patch['url']).name).read_text()) == [
+        {'op': 'replace', 'path': '/title', 'value': 'new'},
+    ]
@@ -0,0 +1,651 @@
+#!/usr/bin/env python3
+"""Validate haddock3 workflow files against a catalog generated by generate_haddock3_catalog.py.
+
+Accepts workflow.cfg files and workflow archives (zip with workflow.cfg inside).
+The flat haddock3 parameter names are converted to the nested parameters of the catalog
+with the tomlSchema of each node, like the workflow builder does when it loads a workflow.
+The JSON schema of each node is compiled once to a validator function.
+
+Writes a JSON line for each workflow with the errors found.
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import json
+import logging
+from pathlib import Path
+import queue
+import re
+import sys
+import threading
+import zipfile
+
+try:
+    import tomllib
+except ImportError:
+    # Python < 3.11
+    import tomli as tomllib
+
+from generate_haddock3_catalog import read_catalog_file, schema_properties
+
+workflow_filename = 'workflow.cfg'
+
+# Keywords which do not constrain the data
+annotation_keywords = {
+    '$comment', '$defs', '$id', '$schema', 'default', 'definitions', 'deprecated', 'description',
+    'examples', 'format', 'readOnly', 'title', 'writeOnly',
+}
+
+
+def argparser_builder():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--catalog', type=Path, default='public/catalog/haddock3.guru.yaml', help='Catalog of a level in YAML or JSON format')
+    parser.add_argument('--jobs', type=int, default=1, help='Number of processes to validate workflows with')
+    parser.add_argument('workflows', nargs='+', help='workflow.cfg or workflow archive files, use - to read file names from stdin')
+    return parser
+
+
+class WorkflowParseError(Exception):
+    pass
+
+
+def json_type(data):
+    if data is None:
+        return 'null'
+    if isinstance(data, bool):
+        return 'boolean'
+    if isinstance(data, int):
+        return 'integer'
+    if isinstance(data, float):
+        return 'number'
+    if isinstance(data, str):
+        return 'string'
+    if isinstance(data, list):
+        return 'array'
+    if isinstance(data, dict):
+        return 'object'
+    return type(data).__name__
+
+
+def is_type(data, type_):
+    actual = json_type(data)
+    if type_ == 'number':
+        return actual in {'integer', 'number'}
+    if type_ == 'integer':
+        return actual == 'integer' or (actual == 'number' and data.is_integer())
+    return actual == type_
+
+
+def json_equal(a, b):
+    """Equality of JSON values, where unlike in Python true is not 1"""
+    return json_type(a).replace('integer', 'number') == json_type(b).replace('integer', 'number') and a == b
+
+
+def toml_layout(schema, toml_schema):
+    """How each parameter with a tomlSchema is written with flat haddock3 names.
+
+    Returns dict with parameter name as key and as value one of
+    * `('scalar_array', None)` for `X_1`, `X_2`,
+    * `('scalar_array2', None)` for `X_1_1`, `X_1_2`,
+    * `('object', None)` for `X_A`, `X_B` where A and B are keys of object parameter,
+    * `('flatten', None)` for `X_Y_1`, `X_Z_1`,
+    * `('flatten2', None)` for `X_Y_1_1`, `X_Z_1_1`,
+    * `('sectioned', <layout of items>)` for `[node.X1]`, `[node.X2]` sub tables,
+    * `('table_array', <layout of items>)` for `[[node.X]]` array of tables,
+    * `('table', None)` for `[node.X]` sub table.
+    Parameters without tomlSchema are written as is.
+    """
+    properties = schema_properties(schema)
+    layout = {}
+    for name, hints in toml_schema.items():
+        items = hints.get('items', {})
+        prop = properties.get(name, {})
+        if not hints.get('indexed'):
+            if items.get('sectioned'):
+                layout[name] = ('table_array', toml_layout(prop.get('items', {}), items.get('properties', {})))
+            elif hints.get('sectioned'):
+                layout[name] = ('table', None)
+            continue
+        if items.get('sectioned'):
+            layout[name] = ('sectioned', toml_layout(prop.get('items', {}), items.get('properties', {})))
+        elif prop.get('type') == 'object':
+            layout[name] = ('object', None)
+        elif items.get('items', {}).get('flatten'):
+            layout[name] = ('flatten2', None)
+        elif items.get('flatten'):
+            layout[name] = ('flatten', None)
+        elif items.get('indexed'):
+            layout[name] = ('scalar_array2', None)
+        else:
+            layout[name] = ('scalar_array', None)
+    return layout
+
+
+def set_item(array, index, value):
+    if index >= len(array):
+        array.extend([None] * (index + 1 - len(array)))
+    array[index] = value
+
+
+def get_item(array, index, factory):
+    if index >= len(array) or array[index] is None:
+        set_item(array, index, factory())
+    return array[index]
+
+
+def index_of(text):
+    """Zero based index of 1 based index in parameter name or None when text is not an index"""
+    if text.isdecimal() and int(text) > 0:
+        return int(text) - 1
+    return None
+
+
+def unflattener(layout):
+    """Function which converts table with flat haddock3 names to nested parameters of catalog.
+
+    Names are matched against all expandable parameters at once, longest parameter name first.
+    Names which do not fit the layout are kept as is, so validation reports them as unknown.
+    """
+    if not layout:
+        return dict
+    names = sorted((name for name, (kind, _) in layout.items() if kind not in {'table', 'table_array'}), key=len, reverse=True)
+    pattern = re.compile(r'(' + '|'.join(re.escape(name) for name in names) + r')(?:_(.+)|(\d+))') if names else None
+    nested = {name: unflattener(sub) for name, (kind, sub) in layout.items() if kind in {'sectioned', 'table_array'}}
+
+    def place(params, name, rest, number, value):
+        kind, _ = layout[name]
+        if kind == 'sectioned':
+            index = index_of(number or '')
+            if index is None or not isinstance(value, dict):
+                return False
+            set_item(params.setdefault(name, []), index, nested[name](value))
+            return True
+        if rest is None:
+            return False
+        if kind == 'object':
+            params.setdefault(name, {})[rest] = value
+            return True
+        parts = rest.split('_')
+        if kind == 'scalar_array' and len(parts) == 1 and (i := index_of(parts[0])) is not None:
+            set_item(params.setdefault(name, []), i, value)
+        elif kind == 'scalar_array2' and len(parts) == 2 and None not in (i := index_of(parts[0]), j := index_of(parts[1])):
+            set_item(get_item(params.setdefault(name, []), i, list), j, value)
+        elif kind == 'flatten' and len(parts) > 1 and (i := index_of(parts[-1])) is not None:
+            get_item(params.setdefault(name, []), i, dict)['_'.join(parts[:-1])] = value
+        elif kind == 'flatten2' and len(parts) > 2 and None not in (i := index_of(parts[-2]), j := index_of(parts[-1])):
+            row = get_item(params.setdefault(name, []), i, list)
+            get_item(row, j, dict)['_'.join(parts[:-2])] = value
+        else:
+            return False
+        return True
+
+    def unflatten(table):
+        params = {}
+        for key, value in table.items():
+            if layout.get(key, ('',))[0] == 'table_array' and isinstance(value, list):
+                params[key] = [nested[key](item) if isinstance(item, dict) else item for item in value]
+                continue
+            match = pattern and pattern.fullmatch(key)
+            if not match or not place(params, *match.groups(), value):
+                params[key] = value
+        return params
+
+    return unflatten
+
+
+toml_key = r'(?:[A-Za-z0-9_-]+|"[^"\\]*"|\'[^\']*\')'
+header_pattern = re.compile(rf'\s*\[\s*({toml_key})((?:\s*\.\s*{toml_key})*)\s*\]\s*(?:#.*)?')
+
+
+def split_sections(text):
+    """Split haddock3 workflow into global table and a table per node.
+
+    haddock3 allows the same node section multiple times, which is not valid TOML,
+    so when a root section is repeated each root section (with its sub sections) is parsed on its own.
+    A root section named like `flexref.1` is also accepted.
+    """
+    chunks = [[None, []]]
+    for line in text.splitlines():
+        match = header_pattern.fullmatch(line)
+        if match is not None:
+            root = match.group(1).strip('"\'')
+            if not match.group(2) or root != chunks[-1][0]:
+                chunks.append([root, []])
+        chunks[-1][1].append(line)
+    roots = [root for root, _ in chunks[1:]]
+    try:
+        if len(set(roots)) == len(roots):
+            table = tomllib.loads(text)
+            global_ = {k: v for k, v in table.items() if k not in roots}
+            return [(None, global_)] + [(re.sub(r'\.\d+$', '', root), table[root]) for root in roots]
+        sections = []
+        for root, lines in chunks:
+            table = tomllib.loads('\n'.join(lines))
+            if root is None:
+                sections.append((None, table))
+            else:
+                sections.append((re.sub(r'\.\d+$', '', root), table[root]))
+        return sections
+    except tomllib.TOMLDecodeError as e:
+        raise WorkflowParseError(f'Invalid TOML: {e}') from e
+
+
+def format_path(path):
+    return ''.join(f'/{p}' for p in path)
+
+
+class SchemaCompiler:
+    """Compiles JSON schema to functions which append errors for data not matching the schema.
+
+    Supports the keywords used in generated catalogs, including `maxItemsFrom` and `maxPropertiesFrom`
+    which are resolved against the global parameters given as context.
+    `$ref` to `#/$defs/` (see --dedup of generator) is followed.
+    The `format` keyword is not checked.
+    """
+    def __init__(self, root):
+        self.root = root
+        self.refs = {}
+
+    def compile(self, schema):
+        if schema is True or schema == {}:
+            return lambda data, path, context, errors: None
+        if schema is False:
+            def never(data, path, context, errors):
+                errors.append(error(path, 'false schema', 'boolean schema is false'))
+            return never
+        checks = []
+        for keyword, value in schema.items():
+            if keyword in annotation_keywords or keyword in {'then', 'else', 'additionalProperties'}:
+                continue
+            builder = getattr(self, 'keyword_' + keyword.replace('$', ''), None)
+            if builder is None:
+                raise ValueError(f'Unsupported JSON schema keyword {keyword}')
+            checks.append(builder(value, schema))
+        if 'additionalProperties' in schema:
+            checks.append(self.keyword_additionalProperties(schema['additionalProperties'], schema))
+
+        def validate(data, path, context, errors):
+            for check in checks:
+                check(data, path, context, errors)
+        return validate
+
+    def keyword_ref(self, ref, schema):
+        if ref not in self.refs:
+            if not ref.startswith('#/'):
+                raise ValueError(f'Only local $ref is supported, got {ref}')
+            target = self.root
+            for part in ref[2:].split('/'):
+                target = target[part]
+            # Placeholder allows recursive references
+            self.refs[ref] = None
+            self.refs[ref] = self.compile(target)
+
+        def check(data, path, context, errors):
+            self.refs[ref](data, path, context, errors)
+        return check
+
+    def keyword_type(self, type_, schema):
+        types = type_ if isinstance(type_, list) else [type_]
+
+        def check(data, path, context, errors):
+            if not any(is_type(data, t) for t in types):
+                errors.append(error(path, 'type', f'must be {",".join(types)}'))
+        return check
+
+    def keyword_enum(self, values, schema):
+        def check(data, path, context, errors):
+            if not any(json_equal(data, v) for v in values):
+                errors.append(error(path, 'enum', 'must be equal to one of the allowed values', allowedValues=values))
+        return check
+
+    def keyword_const(self, value, schema):
+        def check(data, path, context, errors):
+            if not json_equal(data, value):
+                errors.append(error(path, 'const', 'must be equal to constant', allowedValue=value))
+        return check
+
+    def numeric(keyword, op, text):
+        def builder(self, limit, schema):
+            def check(data, path, context, errors):
+                if is_type(data, 'number') and not op(data, limit):
+                    errors.append(error(path, keyword, f'must be {text} {limit}', limit=limit))
+            return check
+        return builder
+
+    keyword_minimum = numeric('minimum', lambda d, l: d >= l, '>=')
+    keyword_maximum = numeric('maximum', lambda d, l: d <= l, '<=')
+    keyword_exclusiveMinimum = numeric('exclusiveMinimum', lambda d, l: d > l, '>')
+    keyword_exclusiveMaximum = numeric('exclusiveMaximum', lambda d, l: d < l, '<')
+
+    def counted(keyword, type_, op, text, unit):
+        def builder(self, limit, schema):
+            def check(data, path, context, errors):
+                if is_type(data, type_) and not op(len(data), limit):
+                    errors.append(error(path, keyword, f'must NOT have {text} than {limit} {unit}', limit=limit))
+            return check
+        return builder
+
+    keyword_minLength = counted('minLength', 'string', lambda n, l: n >= l, 'fewer', 'characters')
+    keyword_maxLength = counted('maxLength', 'string', lambda n, l: n <= l, 'more', 'characters')
+    keyword_minItems = counted('minItems', 'array', lambda n, l: n >= l, 'fewer', 'items')
+    keyword_maxItems = counted('maxItems', 'array', lambda n, l: n <= l, 'more', 'items')
+    keyword_minProperties = counted('minProperties', 'object', lambda n, l: n >= l, 'fewer', 'properties')
+    keyword_maxProperties = counted('maxProperties', 'object', lambda n, l: n <= l, 'more', 'properties')
+    del numeric, counted
+
+    def from_context(keyword, type_, unit):
+        """Builder for maxItemsFrom and maxPropertiesFrom, which limit size to length of a global parameter"""
+        def builder(self, name, schema):
+            def check(data, path, context, errors):
+                parent = context.get(name)
+                if is_type(data, type_) and isinstance(parent, list) and len(data) > len(parent):
+                    errors.append(error(path, keyword, f'must NOT have more than {len(parent)} {unit}, same as {name}', limit=len(parent)))
+            return check
+        return builder
+
+    keyword_maxItemsFrom = from_context('maxItemsFrom', 'array', 'items')
+    keyword_maxPropertiesFrom = from_context('maxPropertiesFrom', 'object', 'properties')
+    del from_context
+
+    def keyword_pattern(self, pattern, schema):
+        regex = re.compile(pattern)
+
+        def check(data, path, context, errors):
+            if isinstance(data, str) and not regex.search(data):
+                errors.append(error(path, 'pattern', f'must match pattern "{pattern}"', pattern=pattern))
+        return check
+
+    def keyword_uniqueItems(self, unique, schema):
+        def check(data, path, context, errors):
+            if not unique or not isinstance(data, list):
+                return
+            seen = {}
+            for i, item in enumerate(data):
+                key = json.dumps(item, sort_keys=True)
+                if key in seen:
+                    errors.append(error(path, 'uniqueItems', f'must NOT have duplicate items (items ## {seen[key]} and {i} are identical)'))
+                    return
+                seen[key] = i
+        return check
+
+    def keyword_required(self, required, schema):
+        def check(data, path, context, errors):
+            if isinstance(data, dict):
+                for name in required:
+                    if name not in data:
+                        errors.append(error(path, 'required', f"must have required property '{name}'", missingProperty=name))
+        return check
+
+    def keyword_properties(self, properties, schema):
+        validators = {name: self.compile(prop) for name, prop in properties.items()}
+
+        def check(data, path, context, errors):
+            if isinstance(data, dict):
+                for name, value in data.items():
+                    validator = validators.get(name)
+                    if validator is not None:
+                        validator(value, path + (name,), context, errors)
+        return check
+
+    def keyword_additionalProperties(self, additional, schema):
+        known = set(schema.get('properties', {}))
+        validator = None if additional is False else self.compile(additional)
+
+        def check(data, path, context, errors):
+            if not isinstance(data, dict):
+                return
+            for name, value in data.items():
+                if name in known:
+                    continue
+                if validator is None:
+                    errors.append(error(path, 'additionalProperties', 'must NOT have additional properties', additionalProperty=name))
+                else:
+                    validator(value, path + (name,), context, errors)
+        return check
+
+    def keyword_propertyNames(self, names_schema, schema):
+        validator = self.compile(names_schema)
+
+        def check(data, path, context, errors):
+            if isinstance(data, dict):
+                for name in data:
+                    name_errors = []
+                    validator(name, path, context, name_errors)
+                    if name_errors:
+                        errors.append(error(path, 'propertyNames', 'property name must be valid', propertyName=name))
+        return check
+
+    def keyword_items(self, items, schema):
+        if isinstance(items, list):
+            validators = [self.compile(item) for item in items]
+
+            def check(data, path, context, errors):
+                if isinstance(data, list):
+                    for i, (validator, item) in enumerate(zip(validators, data)):
+                        validator(item, path + (i,), context, errors)
+            return check
+        validator = self.compile(items)
+
+        def check(data, path, context, errors):
+            if isinstance(data, list):
+                for i, item in enumerate(data):
+                    validator(item, path + (i,), context, errors)
+        return check
+
+    def keyword_if(self, if_schema, schema):
+        if_validator = self.compile(if_schema)
+        branches = {
+            True: ('then', self.compile(schema.get('then', True))),
+            False: ('else', self.compile(schema.get('else', True))),
+        }
+
+        def check(data, path, context, errors):
+            if_errors = []
+            if_validator(data, path, context, if_errors)
+            keyword, validator = branches[not if_errors]
+            branch_errors = []
+            validator(data, path, context, branch_errors)
+            if branch_errors:
+                errors.extend(branch_errors)
+                errors.append(error(path, 'if', f'must match "{keyword}" schema', failingKeyword=keyword))
+        return check
+
+    def keyword_allOf(self, schemas, schema):
+        validators = [self.compile(s) for s in schemas]
+
+        def check(data, path, context, errors):
+            for validator in validators:
+                validator(data, path, context, errors)
+        return check
+
+
+def error(path, keyword, message, **params):
+    return {
+        'instancePath': format_path(path),
+        'keyword': keyword,
+        'message': message,
+        'params': params,
+    }
+
+
+class WorkflowValidator:
+    """Validates haddock3 workflows against a catalog.
+
+    Schemas of nodes are compiled on first use and reused for next workflows.
+    """
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.compiler = SchemaCompiler(catalog)
+        global_ = catalog['global']
+        self.global_keys = set(schema_properties(global_['schema']))
+        self.global_validator = self.compiler.compile(global_['schema'])
+        global_layout = toml_layout(global_['schema'], global_.get('tomlSchema', {}))
+        self.global_unflattener = unflattener(global_layout)
+        # Global parameter whose items are written as numbered tables like [mol1], [mol2]
+        sectioned = [name for name, (kind, _) in global_layout.items() if kind == 'sectioned']
+        self.global_sectioned = re.compile('(?:' + '|'.join(re.escape(name) for name in sectioned) + r')\d+') if sectioned else None
+        self.catalog_nodes = {node['id']: node for node in catalog['nodes']}
+        self.nodes = {}
+
+    def node(self, node_type):
+        """Validator and unflattener of node or None when catalog has no such node"""
+        if node_type not in self.nodes:
+            catalog_node = self.catalog_nodes.get(node_type)
+            if catalog_node is None:
+                self.nodes[node_type] = None
+            else:
+                self.nodes[node_type] = (
+                    self.compiler.compile(catalog_node['schema']),
+                    unflattener(toml_layout(catalog_node['schema'], catalog_node.get('tomlSchema', {}))),
+                )
+        return self.nodes[node_type]
+
+    def is_global_section(self, section):
+        """Whether table of workflow holds a global parameter instead of a node.
+
+        A global parameter can be written as table like `[name]` or, when its tomlSchema is sectioned,
+        as numbered tables like `[name1]`.
+        """
+        if section in self.global_keys:
+            return True
+        return self.global_sectioned is not None and self.global_sectioned.fullmatch(section) is not None
+
+    def parse(self, text):
+        """Parse haddock3 workflow to global parameters and nodes with nested parameters"""
+        global_table = {}
+        nodes = []
+        for section, table in split_sections(text):
+            if section is None:
+                global_table.update(table)
+            elif self.is_global_section(section):
+                global_table[section] = table
+            else:
+                node = self.node(section)
+                parameters = table if node is None else node[1](table)
+                nodes.append({'type': section, 'parameters': parameters})
+        return {
+            'global': self.global_unflattener(global_table),
+            'nodes': nodes,
+        }
+
+    def validate(self, workflow):
+        """Errors of workflow with global parameters and nodes"""
+        errors = []
+        global_ = workflow['global']
+        self.global_validator(global_, (), global_, errors)
+        for e in errors:
+            e['workflowPath'] = 'global'
+        for index, node in enumerate(workflow['nodes']):
+            compiled = self.node(node['type'])
+            if compiled is None:
+                errors.append({
+                    **error((), 'schema', 'must have node name belonging to known nodes', node=node['type']),
+                    'workflowPath': f'nodes[{index}]',
+                })
+                continue
+            node_errors = []
+            compiled[0](node['parameters'], (), global_, node_errors)
+            for e in node_errors:
+                e['workflowPath'] = f'nodes[{index}]'
+            errors.extend(node_errors)
+        return errors
+
+    def validate_text(self, text):
+        return self.validate(self.parse(text))
+
+
+def read_workflow(file):
+    """Text of workflow.cfg file or of workflow.cfg inside workflow archive"""
+    if zipfile.is_zipfile(file):
+        with zipfile.ZipFile(file) as archive:
+            try:
+                return archive.read(workflow_filename).decode()
+            except KeyError:
+                raise WorkflowParseError(f'No {workflow_filename} file found in workflow archive file') from None
+    return Path(file).read_text()
+
+
+validator = None
+
+
+def init_validator(catalog_file):
+    global validator
+    validator = WorkflowValidator(read_catalog_file(catalog_file))
+
+
+def validate_file(file):
+    """Result of validating a workflow file, with parse errors reported as errors"""
+    try:
+        errors = validator.validate_text(read_workflow(file))
+    except (OSError, UnicodeDecodeError, WorkflowParseError) as e:
+        errors = [{'workflowPath': '', **error((), 'parse', str(e))}]
+    return {
+        'file': str(file),
+        'valid': not errors,
+        'errors': errors,
+    }
+
+
+def workflow_files(names):
+    for name in names:
+        if name == '-':
+            for line in sys.stdin:
+                if line.strip():
+                    yield line.strip()
+        else:
+            yield name
+
+
+def ordered_results(executor, fn, items, max_pending):
+    """Results of fn applied to each item in executor, in order of items.
+
+    Unlike executor.map, which submits all items before returning, a thread submits the items
+    while results are yielded, with at most max_pending submitted items whose result has not been yielded.
+    So results of files read from stdin are written while the producer is still writing file names.
+    """
+    pending = queue.Queue()
+    slots = threading.Semaphore(max_pending)
+    end = object()
+
+    def submit():
+        try:
+            for item in items:
+                slots.acquire()
+                pending.put(executor.submit(fn, item))
+        except Exception as e:
+            pending.put(e)
+        pending.put(end)
+
+    threading.Thread(target=submit, daemon=True).start()
+    while (future := pending.get()) is not end:
+        if isinstance(future, Exception):
+            raise future
+        yield future.result()
+        slots.release()
+
+
+def main(argv=sys.argv[1:]):
+    args = argparser_builder().parse_args(argv)
+    files = workflow_files(args.workflows)
+    if args.jobs > 1:
+        executor = ProcessPoolExecutor(max_workers=args.jobs, initializer=init_validator, initargs=(args.catalog,))
+        results = ordered_results(executor, validate_file, files, max_pending=4 * args.jobs)
+    else:
+        executor = None
+        init_validator(args.catalog)
+        results = map(validate_file, files)
+    nr_invalid = 0
+    try:
+        for result in results:
+            nr_invalid += not result['valid']
+            print(json.dumps(result), flush=True)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+    if nr_invalid:
+        logging.warning(f'{nr_invalid} invalid workflow(s)')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())